@@ -1,422 +1,1417 @@
 import argparse
+import asyncio
+import itertools
 import os
+import socket
+import subprocess
 import sys
+import threading
 import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, defaultdict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from datetime import date
 
-def check_registration(plate_number):
+from checkpoint import DEFAULT_CHECKPOINT_DIR, CheckpointJournal, journal_path_for
+from fleet_store import DEFAULT_EXPIRY_WINDOW, DEFAULT_FLEET_PATH, DEFAULT_MAX_AGE_DAYS, FleetStore
+from http_engine import SEARCH_URL, HttpLookupEngine, PageChangedError
+from locator_registry import DEFAULT_LOCATORS_PATH, LocatorRegistry
+from lookup_service import DEFAULT_SERVICE_PORT, LookupService, ServiceServer, request_lookups, service_running
+from metrics import metrics, serve_metrics
+from rate_control import AdaptiveConcurrency, CircuitBreaker, RetryPolicy, TokenBucket
+from registration_parser import extract_results, parse_page
+from result_cache import DEFAULT_CACHE_PATH, DEFAULT_TTLS, ResultCache, normalise_plate
+from result_output import FORMATS, open_result_writer
+from work_queue import DEFAULT_LEASE_SECONDS, WorkQueue
+
+ENGINES = ("selenium", "http")
+
+# Set by --lean; see create_driver
+LEAN_BROWSER = False
+
+LEAN_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-gpu-compositing",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-sync",
+    "--blink-settings=imagesEnabled=false",
+]
+
+# Requests a lean browser never makes; the lookups only need the HTML and its scripts
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico",
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+]
+
+# Bytes transferred since the last call on this document. AJAX updates keep the
+# document, so the navigation is counted once per timeOrigin and resource entries
+# are cleared once read. Cached responses count as 0, as do cross-origin
+# resources that hide their timings.
+TRANSFER_SIZE_SCRIPT = """
+var entries = performance.getEntriesByType('resource');
+if (window.__bytesCountedFor !== performance.timeOrigin) {
+    window.__bytesCountedFor = performance.timeOrigin;
+    entries = entries.concat(performance.getEntriesByType('navigation'));
+}
+performance.clearResourceTimings();
+return entries.reduce(function (total, entry) { return total + (entry.transferSize || 0); }, 0);
+"""
+
+# Options a running lookup service has its own values for; a call setting any of them is checked locally
+SERVICE_SETTINGS = ("engine", "url", "lean", "cache", "no_cache", "max_age", "ttl_registered", "ttl_not_found",
+                    "ttl_error", "rate", "retries", "backoff", "locators")
+
+# Site error messages that will not go away if the same plate is tried again
+PERMANENT_ERRORS = ("valid registration number",)
+
+# Number of lookups a pooled browser session serves before it is recycled
+DEFAULT_RECYCLE_AFTER = 50
+
+webdriver = Options = By = WebDriverWait = None
+
+def load_selenium():
     """
-    Check vehicle registration details using Selenium with Edge browser
+    Import Selenium on first use, installing it if it is missing
     """
+    global webdriver, Options, By, WebDriverWait
+    if webdriver is not None:
+        return
+
+    # Make sure we have the required packages
     try:
-        # Make sure we have the required packages
-        try:
-            from selenium import webdriver
-            from selenium.webdriver.edge.options import Options
-            from selenium.webdriver.common.by import By
-            from selenium.webdriver.support.ui import WebDriverWait
-            from selenium.webdriver.support import expected_conditions as EC
-        except ImportError:
-            print("Required packages not found. Installing...")
-            os.system(f"{sys.executable} -m pip install selenium")
-            from selenium import webdriver
-            from selenium.webdriver.edge.options import Options
-            from selenium.webdriver.common.by import By
-            from selenium.webdriver.support.ui import WebDriverWait
-            from selenium.webdriver.support import expected_conditions as EC
-            
-        print(f"Checking registration for plate number: {plate_number}...")
-        
-        # Setup Edge options
-        edge_options = Options()
-        edge_options.add_argument("--headless")
+        from selenium import webdriver
+        from selenium.webdriver.edge.options import Options
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+    except ImportError:
+        print("Required packages not found. Installing...")
+        os.system(f"{sys.executable} -m pip install selenium")
+        from selenium import webdriver
+        from selenium.webdriver.edge.options import Options
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+
+def create_driver(lean=None):
+    """
+    Start a headless Edge browser
+
+    A lean browser loads pages without images, stylesheets, fonts or
+    analytics, returns from navigation once the DOM is ready, and runs with a
+    small window and without extensions, GPU compositing or background
+    networking. Lookups only read form fields and text, so they work the same.
+
+    Args:
+        lean: Start a lean browser (default: LEAN_BROWSER)
+    """
+    load_selenium()
+    if lean is None:
+        lean = LEAN_BROWSER
+
+    # Setup Edge options
+    edge_options = Options()
+    edge_options.add_argument("--headless")
+    if lean:
+        edge_options.page_load_strategy = "eager"
+        edge_options.add_argument("--window-size=800,600")
+        for argument in LEAN_ARGUMENTS:
+            edge_options.add_argument(argument)
+    else:
         edge_options.add_argument("--window-size=1920,1080")
-        
-        # Initialize the Edge driver
+
+    # Initialize the Edge driver
+    with metrics.span("driver_start", engine="selenium"):
         driver = webdriver.Edge(options=edge_options)
-        
+
+    if lean:
         try:
-            # Navigate to the Queensland Transport registration check page
-            url = "https://www.service.transport.qld.gov.au/checkrego/application/VehicleSearch.xhtml"
-            driver.get(url)
-            
-            # Wait for the page to load
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            
-            # Check if we need to accept Terms of Use
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+        except Exception as e:
+            print(f"Could not block page resources, continuing with them: {e}")
+    return driver
+
+def record_page_bytes(driver):
+    """
+    Count the bytes the browser transferred for the current page and its resources since the last call
+    """
+    try:
+        transferred = driver.execute_script(TRANSFER_SIZE_SCRIPT)
+    except Exception:
+        return
+    if transferred:
+        metrics.increment("bytes_received_total", int(transferred), engine="selenium")
+
+def _first(elements):
+    return elements[0] if elements else None
+
+def _find_by_keywords(driver, tag, attributes, keywords, include_text=False):
+    """
+    Return the first element whose attributes (or text) mention one of the keywords
+    """
+    for element in driver.find_elements(By.TAG_NAME, tag):
+        values = [element.get_attribute(attribute) for attribute in attributes]
+        if include_text:
+            values.append(element.text)
+        for value in values:
+            if value and any(keyword in value.lower() for keyword in keywords):
+                print(f"Selected {tag} matching {value!r}")
+                return element
+    return None
+
+# Ways to find each element, most specific first. Each finder returns the
+# element or None without waiting, so a strategy that misses costs one round trip.
+LOCATORS = {
+    "terms_button": [
+        ("id", lambda d: _first(d.find_elements(By.ID, "termsForm:acceptButton"))),
+        ("text", lambda d: _first(d.find_elements(By.XPATH, "//button[contains(text(), 'Accept')]"))),
+        ("class", lambda d: _first(d.find_elements(By.XPATH, "//button[contains(@class, 'ui-button')]"))),
+        ("any button", lambda d: _find_by_keywords(d, "button", [], ["accept", "agree", "terms"], include_text=True)),
+    ],
+    "plate_input": [
+        ("id", lambda d: _first(d.find_elements(By.ID, "vehicleSearchForm:plateNumber"))),
+        ("id contains", lambda d: _first(d.find_elements(By.XPATH, "//input[contains(@id, 'plateNumber')]"))),
+        ("name", lambda d: _first(d.find_elements(By.NAME, "vehicleSearchForm:plateNumber"))),
+        ("any input", lambda d: _find_by_keywords(d, "input", ["id", "name"], ["plate", "rego"])),
+    ],
+    "search_button": [
+        ("id", lambda d: _first(d.find_elements(By.ID, "vehicleSearchForm:confirmButton"))),
+        ("search id", lambda d: _first(d.find_elements(By.ID, "vehicleSearchForm:searchButton"))),
+        ("id contains", lambda d: _first(d.find_elements(By.XPATH, "//button[contains(@id, 'confirmButton')]"))),
+        ("text", lambda d: _first(d.find_elements(By.XPATH, "//button[contains(text(), 'Search')]"))),
+        ("submit", lambda d: _first(d.find_elements(By.XPATH, "//button[@type='submit']"))),
+        ("any button", lambda d: _find_by_keywords(d, "button", ["id"], ["search", "find", "confirm", "check"],
+                                                   include_text=True)),
+    ],
+}
+
+# Remembers the strategy that last found each element; replaced by the CLI with a file-backed one
+locator_registry = LocatorRegistry()
+
+# Reports which of the three result states the page is in, in a single round trip
+RESULT_STATE_SCRIPT = """
+if (document.querySelector('dl.data')) { return 'results'; }
+if (document.querySelector('.ui-messages-error-detail')) { return 'error'; }
+if (document.body && document.body.innerText.indexOf('Registration not found') !== -1) { return 'not found'; }
+return null;
+"""
+
+def locate(driver, elements, timeout=10):
+    """
+    Wait until one of the named elements appears and return (name, element)
+
+    Each poll only tries the strategy that worked last time (or the most
+    specific one) for each name, so the wait ends as soon as the page is
+    ready. The other strategies, some of which scan every element on the
+    page, run once when the document has loaded without a match, and once
+    more if the wait times out.
+    """
+    ordered = {element: locator_registry.order(element, LOCATORS[element]) for element in elements}
+    preferred = [(element, strategies[0]) for element, strategies in ordered.items()]
+    fallbacks = [(element, strategy) for element, strategies in ordered.items() for strategy in strategies[1:]]
+    scanned = []
+
+    def first_match(d, candidates):
+        for element, (strategy_name, finder) in candidates:
             try:
-                # Look for the Terms of Use button using various methods
-                terms_button = None
-                
-                # Try by ID
-                try:
-                    terms_button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.ID, "termsForm:acceptButton"))
-                    )
-                    print("Found Terms of Use button by ID")
-                except:
-                    # Try by XPath with text
-                    try:
-                        terms_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Accept')]")
-                        print("Found Terms of Use button by text 'Accept'")
-                    except:
-                        # Try by XPath with class
-                        try:
-                            terms_button = driver.find_element(By.XPATH, "//button[contains(@class, 'ui-button')]")
-                            print(f"Found button with class 'ui-button': {terms_button.text}")
-                        except:
-                            # Try by any button
-                            try:
-                                buttons = driver.find_elements(By.TAG_NAME, "button")
-                                if buttons:
-                                    for button in buttons:
-                                        print(f"Found button: {button.text}")
-                                        if "accept" in button.text.lower() or "agree" in button.text.lower() or "terms" in button.text.lower():
-                                            terms_button = button
-                                            print(f"Selected button with text: {button.text}")
-                                            break
-                            except:
-                                print("Could not find any buttons")
-                
-                # If we found a Terms of Use button, click it
-                if terms_button:
-                    print("Clicking Terms of Use button...")
-                    terms_button.click()
-                    
-                    # Wait for the page to update after accepting terms
-                    time.sleep(2)
-                else:
-                    print("No Terms of Use button found. The page might have already loaded or the structure has changed.")
-            except Exception as e:
-                print(f"Error handling Terms of Use: {e}")
-                traceback.print_exc()
-            
-            # Now try to find the plate number input field
+                found = finder(d)
+            except Exception:
+                continue
+            if found is not None:
+                return element, strategy_name, found
+        return None
+
+    def probe(d):
+        match = first_match(d, preferred)
+        if match is None and not scanned:
             try:
-                plate_input = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "vehicleSearchForm:plateNumber"))
-                )
-                print("Found plate number input field by ID")
-            except:
-                print("Could not find the plate number input field by ID. Trying alternative methods...")
-                # Try to find by XPath
-                try:
-                    plate_input = driver.find_element(By.XPATH, "//input[contains(@id, 'plateNumber')]")
-                    print(f"Found plate input field with ID: {plate_input.get_attribute('id')}")
-                except:
-                    print("Could not find the plate number input field by XPath.")
-                    # Try to find by name
-                    try:
-                        plate_input = driver.find_element(By.NAME, "vehicleSearchForm:plateNumber")
-                        print(f"Found plate input field with name: {plate_input.get_attribute('name')}")
-                    except:
-                        print("Could not find the plate number input field by name.")
-                        # Try to find any input field
-                        try:
-                            inputs = driver.find_elements(By.TAG_NAME, "input")
-                            if inputs:
-                                print(f"Found {len(inputs)} input fields:")
-                                for i, input_field in enumerate(inputs):
-                                    input_id = input_field.get_attribute('id')
-                                    input_name = input_field.get_attribute('name')
-                                    input_type = input_field.get_attribute('type')
-                                    print(f"  Input {i+1}: ID={input_id}, Name={input_name}, Type={input_type}")
-                                
-                                # Try to find an input that looks like it's for a plate number
-                                for input_field in inputs:
-                                    input_id = input_field.get_attribute('id')
-                                    input_name = input_field.get_attribute('name')
-                                    if input_id and ('plate' in input_id.lower() or 'rego' in input_id.lower()):
-                                        plate_input = input_field
-                                        print(f"Selected input field with ID: {input_id}")
-                                        break
-                                    elif input_name and ('plate' in input_name.lower() or 'rego' in input_name.lower()):
-                                        plate_input = input_field
-                                        print(f"Selected input field with Name: {input_name}")
-                                        break
-                            else:
-                                print("No input fields found on the page")
-                        except:
-                            print("Error finding input fields")
-                        
-                        # If we still can't find it, raise an exception
-                        if 'plate_input' not in locals():
-                            raise Exception("Could not locate the plate number input field")
-            
-            # Enter the plate number
-            plate_input.clear()
-            plate_input.send_keys(plate_number)
-            
-            # Find the search button - using the specific ID you provided
+                loaded = d.execute_script("return document.readyState") != "loading"
+            except Exception:
+                loaded = False
+            if loaded:
+                scanned.append(True)
+                match = first_match(d, fallbacks)
+        return match or False
+
+    try:
+        element, strategy_name, found = WebDriverWait(driver, timeout, poll_frequency=0.2).until(probe)
+    except Exception:
+        match = first_match(driver, fallbacks)
+        if match is None:
+            raise Exception(f"Could not locate the {' or '.join(e.replace('_', ' ') for e in elements)}")
+        element, strategy_name, found = match
+
+    locator_registry.record(element, strategy_name)
+    metrics.increment("locator_matches_total", element=element, strategy=strategy_name)
+    if strategy_name != LOCATORS[element][0][0]:
+        metrics.increment("locator_fallbacks_total", element=element, strategy=strategy_name)
+    print(f"Found {element.replace('_', ' ')} by {strategy_name}")
+    return element, found
+
+def open_search_form(driver):
+    """
+    Navigate to the registration check page and accept the Terms of Use if they are shown
+    """
+    with metrics.span("page_load", engine="selenium"):
+        # Navigate to the Queensland Transport registration check page
+        driver.get(SEARCH_URL)
+
+        # A warm session has already accepted the terms and lands straight on the search form
+        element, found = locate(driver, ["plate_input", "terms_button"])
+    record_page_bytes(driver)
+    if element == "plate_input":
+        return
+
+    with metrics.span("terms", engine="selenium"):
+        print("Clicking Terms of Use button...")
+        found.click()
+
+        # Wait for the search form to replace the Terms of Use page
+        locate(driver, ["plate_input"])
+    record_page_bytes(driver)
+
+def search_plate(driver, plate_number):
+    """
+    Submit a plate number on the search form and extract the registration details
+    """
+    with metrics.span("search_submit", engine="selenium"):
+        _, plate_input = locate(driver, ["plate_input"])
+
+        # Enter the plate number
+        plate_input.clear()
+        plate_input.send_keys(plate_number)
+
+        _, search_button = locate(driver, ["search_button"])
+
+        # Click the search button
+        print("Clicking search button...")
+        search_button.click()
+
+        # Wait for the results, an error message or the not found page, whichever comes first
+        try:
+            WebDriverWait(driver, 15, poll_frequency=0.2).until(
+                lambda d: d.execute_script(RESULT_STATE_SCRIPT)
+            )
+        except Exception:
+            print("Timed out waiting for a recognisable result page")
+    record_page_bytes(driver)
+
+    # Fetch the page once and parse it offline rather than querying each field
+    with metrics.span("page_source", engine="selenium"):
+        page_source = driver.page_source
+    with metrics.span("parse", engine="selenium"):
+        page = parse_page(page_source)
+        registration_details = extract_results(page, plate_number)
+
+    if registration_details is None:
+        print("Could not find any registration details on the page")
+        body_text = " ".join("".join(page.text).split())
+        registration_details = {
+            "Plate Number": plate_number,
+            "Raw Content": body_text,
+            "Status": "UNKNOWN",
+            "Message": "Could not extract registration details",
+        }
+    elif registration_details["Status"] == "ERROR":
+        print(f"Error: {registration_details['Message']}")
+        return registration_details
+    elif registration_details["Status"] == "NOT FOUND":
+        print(f"Registration not found for plate number: {plate_number}")
+        return registration_details
+
+    print_registration_details(plate_number, registration_details)
+    return registration_details
+
+def print_registration_details(plate_number, registration_details):
+    """
+    Print the registration details for a plate
+    """
+    print(f"\nRegistration details for plate number {plate_number}:")
+    print("-" * 50)
+    for key, value in registration_details.items():
+        print(f"{key}: {value}")
+
+def check_registration(plate_number, session=None):
+    """
+    Check vehicle registration details using Selenium with Edge browser
+
+    Args:
+        plate_number: The plate number to check
+        session: Optional DriverSession to run the lookup in. When omitted a
+            browser is started for this lookup and closed afterwards.
+
+    Returns:
+        Registration details dictionary
+    """
+    try:
+        load_selenium()
+
+        print(f"Checking registration for plate number: {plate_number}...")
+
+        if session is not None:
             try:
-                search_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, "vehicleSearchForm:confirmButton"))
-                )
-                print("Found search button with ID 'vehicleSearchForm:confirmButton'")
-            except:
-                print("Could not find the search button with ID 'vehicleSearchForm:confirmButton'. Trying alternative methods...")
-                # Try to find by ID with searchButton
-                try:
-                    search_button = driver.find_element(By.ID, "vehicleSearchForm:searchButton")
-                    print(f"Found search button with ID: vehicleSearchForm:searchButton")
-                except:
-                    print("Could not find the search button by ID 'vehicleSearchForm:searchButton'.")
-                    # Try to find by XPath
-                    try:
-                        search_button = driver.find_element(By.XPATH, "//button[contains(@id, 'confirmButton')]")
-                        print(f"Found search button with ID containing 'confirmButton'")
-                    except:
-                        print("Could not find the search button by XPath with 'confirmButton'.")
-                        # Try to find by text
-                        try:
-                            search_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Search')]")
-                            print(f"Found search button with text: Search")
-                        except:
-                            print("Could not find the search button by text 'Search'.")
-                            # Try to find any submit button
-                            try:
-                                search_button = driver.find_element(By.XPATH, "//button[@type='submit']")
-                                print(f"Found submit button")
-                            except:
-                                print("Could not find any submit button.")
-                                # Try to find any button
-                                try:
-                                    buttons = driver.find_elements(By.TAG_NAME, "button")
-                                    if buttons:
-                                        print(f"Found {len(buttons)} buttons:")
-                                        for i, button in enumerate(buttons):
-                                            button_id = button.get_attribute('id')
-                                            button_text = button.text
-                                            print(f"  Button {i+1}: ID={button_id}, Text={button_text}")
-                                        
-                                        # Try to find a button that looks like a search button
-                                        for button in buttons:
-                                            button_id = button.get_attribute('id')
-                                            button_text = button.text
-                                            if button_id and ('search' in button_id.lower() or 'find' in button_id.lower() or 'confirm' in button_id.lower()):
-                                                search_button = button
-                                                print(f"Selected button with ID: {button_id}")
-                                                break
-                                            elif button_text and ('search' in button_text.lower() or 'find' in button_text.lower() or 'check' in button_text.lower()):
-                                                search_button = button
-                                                print(f"Selected button with Text: {button_text}")
-                                                break
-                                    else:
-                                        print("No buttons found on the page")
-                                except:
-                                    print("Error finding buttons")
-                                
-                                # If we still can't find it, raise an exception
-                                if 'search_button' not in locals():
-                                    raise Exception("Could not locate the search button")
-            
-            # Click the search button
-            print("Clicking search button...")
-            search_button.click()
-            
-            # Wait for results to load - more flexible approach
-            time.sleep(3)  # Give the page time to load
-            
-            # Check if there's an error message
-            error_messages = driver.find_elements(By.CLASS_NAME, "ui-messages-error-detail")
-            if error_messages:
-                error_text = error_messages[0].text
-                print(f"Error: {error_text}")
-                return {"Plate Number": plate_number, "Status": "ERROR", "Message": error_text}
-            
-            # Check for "Registration not found" message
-            not_found_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'Registration not found')]")
-            if not_found_elements:
-                print(f"Registration not found for plate number: {plate_number}")
-                return {"Plate Number": plate_number, "Status": "NOT FOUND", "Message": "Registration not found"}
-            
-            # Extract registration details based on the HTML structure
-            registration_details = {"Plate Number": plate_number}
-            
-            # Get all dl.data elements
-            data_lists = driver.find_elements(By.CSS_SELECTOR, "dl.data")
-            
-            if data_lists:
-                print(f"Found {len(data_lists)} data lists")
-                
-                # Process each data list
-                for dl in data_lists:
-                    # Get all dt (term) and dd (definition) elements
-                    terms = dl.find_elements(By.TAG_NAME, "dt")
-                    definitions = dl.find_elements(By.TAG_NAME, "dd")
-                    
-                    # Pair them up and add to registration_details
-                    for i in range(min(len(terms), len(definitions))):
-                        term = terms[i].text.strip()
-                        definition = definitions[i].text.strip()
-                        if term and term not in registration_details:  # Avoid duplicates
-                            registration_details[term] = definition
-                
-                # Make sure we have Status field for the summary
-                if "Status" in registration_details:
-                    # Status field already exists
-                    pass
-                else:
-                    # Try to determine status from other fields
-                    registration_details["Status"] = "REGISTERED" if "Expiry" in registration_details else "UNKNOWN"
-            else:
-                print("Could not find any data lists on the page")
-                
-                # Try to extract data from page source directly
-                page_source = driver.page_source
-                
-                # Check if there's any form with registration data
-                if "dl class=\"data\"" in page_source:
-                    print("Found data lists in page source but couldn't extract with Selenium")
-                    
-                    # Try a different approach to extract data
-                    import re
-                    
-                    # Extract registration number
-                    reg_match = re.search(r'<dt>Registration number\s*</dt>\s*<dd>([^<]+)</dd>', page_source)
-                    if reg_match:
-                        registration_details["Registration number"] = reg_match.group(1).strip()
-                    
-                    # Extract VIN
-                    vin_match = re.search(r'<dt>Vehicle Identification Number \(VIN\)\s*</dt>\s*<dd>([^<]+)</dd>', page_source)
-                    if vin_match:
-                        registration_details["Vehicle Identification Number (VIN)"] = vin_match.group(1).strip()
-                    
-                    # Extract Description
-                    desc_match = re.search(r'<dt>Description\s*</dt>\s*<dd>([^<]+)</dd>', page_source)
-                    if desc_match:
-                        registration_details["Description"] = desc_match.group(1).strip()
-                    
-                    # Extract Purpose of use
-                    purpose_match = re.search(r'<dt>Purpose of use\s*</dt>\s*<dd>([^<]+)</dd>', page_source)
-                    if purpose_match:
-                        registration_details["Purpose of use"] = purpose_match.group(1).strip()
-                    
-                    # Extract Status
-                    status_match = re.search(r'<dt>Status\s*</dt>\s*<dd>([^<]+)</dd>', page_source)
-                    if status_match:
-                        registration_details["Status"] = status_match.group(1).strip()
-                    
-                    # Extract Expiry
-                    expiry_match = re.search(r'<dt>Expiry\s*</dt>\s*<dd>([^<]+)</dd>', page_source)
-                    if expiry_match:
-                        registration_details["Expiry"] = expiry_match.group(1).strip()
-                else:
-                    # Fallback: try to extract any text content from the page
-                    body_text = driver.find_element(By.TAG_NAME, "body").text
-                    if "Registration not found" in body_text:
-                        registration_details["Status"] = "NOT FOUND"
-                        registration_details["Message"] = "Registration not found"
-                    else:
-                        registration_details["Raw Content"] = body_text
-                        registration_details["Status"] = "UNKNOWN"
-                        registration_details["Message"] = "Could not extract registration details"
-            
-            # Print the results
-            print(f"\nRegistration details for plate number {plate_number}:")
-            print("-" * 50)
-            for key, value in registration_details.items():
-                print(f"{key}: {value}")
-            
-            return registration_details
-            
+                open_search_form(session.driver)
+                return search_plate(session.driver, plate_number)
+            except Exception:
+                # Don't hand a browser in an unknown state to the next plate
+                session.broken = True
+                raise
+
+        driver = create_driver()
+
+        try:
+            open_search_form(driver)
+            return search_plate(driver, plate_number)
+
         finally:
             # Close the browser
             driver.quit()
-        
+
     except Exception as e:
         print(f"An error occurred: {e}")
         traceback.print_exc()
         return {"Plate Number": plate_number, "Status": "ERROR", "Message": str(e)}
 
-def check_multiple_registrations(plate_numbers, max_workers=4):
+class DriverSession:
+    """
+    A long-lived browser that serves several lookups before being recycled
+    """
+
+    def __init__(self):
+        self.driver = create_driver()
+        self.uses = 0
+        self.broken = False
+
+    def is_healthy(self):
+        """
+        Check that the browser is still responding to commands
+        """
+        if self.broken:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"Error closing browser session: {e}")
+
+class DriverPool:
+    """
+    Bounded pool of warm browser sessions shared by concurrent lookups
+
+    Sessions are created lazily up to max_size. A session is replaced when it
+    has served recycle_after lookups, when a lookup left it broken, or when it
+    fails its health check on checkout.
+    """
+
+    def __init__(self, max_size=4, recycle_after=DEFAULT_RECYCLE_AFTER):
+        self.max_size = max_size
+        self.recycle_after = recycle_after
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Borrow a healthy session, starting a new browser if the pool has room
+        """
+        while True:
+            with self._condition:
+                while not self._closed and not self._idle and self._created >= self.max_size:
+                    self._condition.wait()
+                if self._closed:
+                    raise Exception("Driver pool is closed")
+                if self._idle:
+                    session = self._idle.pop()
+                else:
+                    # Reserve the slot now, but start the browser outside the lock
+                    self._created += 1
+                    session = None
+
+            if session is None:
+                try:
+                    return DriverSession()
+                except Exception:
+                    self._discard()
+                    raise
+
+            if session.is_healthy():
+                return session
+
+            print("Browser session failed its health check. Replacing it...")
+            session.close()
+            self._discard()
+
+    def release(self, session):
+        """
+        Return a session to the pool, recycling it if it is worn out or broken
+        """
+        session.uses += 1
+        if self._closed or session.broken or session.uses >= self.recycle_after:
+            session.close()
+            self._discard()
+            return
+
+        with self._condition:
+            self._idle.append(session)
+            self._condition.notify()
+
+    def _discard(self):
+        with self._condition:
+            self._created -= 1
+            self._condition.notify()
+
+    def close(self):
+        """
+        Quit every idle browser. Sessions still checked out are closed on release.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for session in idle:
+            session.close()
+            self._discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+def check_pooled_registration(pool, plate_number):
+    """
+    Check a plate using a session borrowed from a DriverPool
+    """
+    try:
+        session = pool.acquire()
+    except Exception as e:
+        print(f"Could not start a browser session for plate {plate_number}: {e}")
+        return {"Plate Number": plate_number, "Status": "ERROR", "Message": str(e)}
+
+    try:
+        return check_registration(plate_number, session=session)
+    finally:
+        pool.release(session)
+
+def record_outcome(result):
+    """
+    Count a finished lookup by its status
+    """
+    metrics.increment("lookups_total", status=result.get("Status", "UNKNOWN"))
+
+def check_registration_http(engine, plate_number, pool=None):
+    """
+    Check vehicle registration details over plain HTTP, without a browser
+
+    Falls back to Selenium if the HTTP engine finds the pages have changed.
+
+    Args:
+        engine: HttpLookupEngine to run the lookup with
+        plate_number: The plate number to check
+        pool: Optional DriverPool to borrow a browser from for the fallback
+
+    Returns:
+        Registration details dictionary
+    """
+    print(f"Checking registration for plate number: {plate_number} over HTTP...")
+    try:
+        registration_details = engine.check_registration(plate_number)
+    except PageChangedError as e:
+        print(f"HTTP engine could not follow the page ({e}). Falling back to Selenium...")
+        metrics.increment("engine_fallbacks_total")
+        if pool is not None:
+            return check_pooled_registration(pool, plate_number)
+        return check_registration(plate_number)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        traceback.print_exc()
+        return {"Plate Number": plate_number, "Status": "ERROR", "Message": str(e)}
+
+    print_registration_details(plate_number, registration_details)
+    return registration_details
+
+def is_transient_failure(result):
+    """
+    True if a lookup ended in an error that may clear up when the plate is tried again
+
+    Results such as REGISTERED or NOT FOUND are final, as are site errors that
+    reject the plate number itself. An UNKNOWN result, a page that couldn't be
+    read such as a timeout or a maintenance page, counts as transient.
+    """
+    if not result:
+        return False
+    if result.get("Status") == "UNKNOWN":
+        return True
+    if result.get("Status") != "ERROR":
+        return False
+    message = str(result.get("Message", "")).lower()
+    return not any(error in message for error in PERMANENT_ERRORS)
+
+async def check_many(plate_numbers, concurrency=4, rate=None, engine="selenium",
+                     recycle_after=DEFAULT_RECYCLE_AFTER, cache=None, max_age=None, checkpoint=None,
+                     max_concurrency=None, retry=None, breaker=None):
+    """
+    Check many vehicle registrations on one event loop, yielding results as they complete
+
+    At most `concurrency` lookups are in flight at once, and when `rate` is set
+    a token bucket keeps new lookups from starting faster than `rate` per
+    second. Plates are pulled from `plate_numbers` only as slots free up, so
+    it may be any iterable or async iterable. The engines themselves are
+    blocking, so each lookup runs on an executor thread. Plates with a fresh
+    result in `cache` are answered from it without using a slot or a token.
+    Plates `checkpoint` holds a result from an earlier run for are skipped,
+    and every result is recorded in it before being yielded.
+
+    With `max_concurrency`, `concurrency` is only the starting limit: an
+    AdaptiveConcurrency controller raises it while lookups stay fast and
+    succeed, and cuts it when latency or transient errors spike. Transient
+    errors are retried with backoff according to `retry`, and `breaker` pauses
+    every lookup while the site appears to be down. Only the final attempt at
+    a plate is yielded.
+
+    A plate that comes up again while its lookup is still in flight waits for
+    that lookup rather than starting another, and its result is yielded once
+    for every time the plate was pulled.
+
+    With the Selenium engine each lookup borrows a warm browser session from a
+    shared pool, so the browser start-up and Terms of Use are paid once per
+    session rather than once per plate. The HTTP engine keeps one JSF session
+    per thread and only starts browsers if it has to fall back to Selenium.
+
+    Args:
+        plate_numbers: Iterable or async iterable of plate numbers to check
+        concurrency: Maximum number of lookups in flight (default: 4)
+        rate: Maximum lookups started per second, or None for no limit
+        engine: "selenium" or "http" (default: "selenium")
+        recycle_after: Lookups served by a browser session before it is restarted
+        cache: Optional ResultCache to answer from and store new results in
+        max_age: Ignore cached results older than this many seconds
+        checkpoint: Optional CheckpointJournal to skip completed plates and record new ones
+        max_concurrency: Let the limit adapt between 1 and this many lookups in flight
+        retry: Optional RetryPolicy for lookups that end in a transient error
+        breaker: Optional CircuitBreaker to pause lookups while the site is down
+
+    Yields:
+        Registration details dictionaries, in completion order
+    """
+    loop = asyncio.get_running_loop()
+    bucket = TokenBucket(rate) if rate else None
+    controller = None
+    if max_concurrency and max_concurrency > concurrency:
+        controller = AdaptiveConcurrency(concurrency, maximum=max_concurrency)
+    max_workers = controller.maximum if controller is not None else concurrency
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pool = DriverPool(max_size=max_workers, recycle_after=recycle_after)
+    http_engine = HttpLookupEngine(SEARCH_URL) if engine == "http" else None
+    metrics.gauge("concurrency_limit", concurrency)
+
+    async def attempt(plate):
+        if breaker is not None:
+            started_at = await breaker.wait()
+        if bucket is not None:
+            await bucket.acquire()
+
+        start = time.perf_counter()
+        try:
+            with metrics.span("lookup", engine=engine):
+                if http_engine is not None:
+                    result = await loop.run_in_executor(executor, check_registration_http, http_engine, plate, pool)
+                else:
+                    result = await loop.run_in_executor(executor, check_pooled_registration, pool, plate)
+        except Exception as e:
+            print(f"Error processing plate {plate}: {e}")
+            result = {"Plate Number": plate, "Status": "ERROR", "Message": str(e)}
+        failed = is_transient_failure(result)
+
+        if controller is not None:
+            previous = controller.limit
+            limit = controller.record(time.perf_counter() - start, failed)
+            if limit is not None:
+                metrics.gauge("concurrency_limit", limit)
+                if limit < previous:
+                    print(f"Lookups slowing down or failing; lowering concurrency to {limit}")
+                metrics.increment("concurrency_changes_total", direction="up" if limit > previous else "down")
+        if breaker is not None:
+            change = breaker.record(failed, started_at)
+            if change == "opened":
+                print(f"Site appears to be down; pausing lookups for {breaker.reset_timeout:g} seconds...")
+                metrics.increment("circuit_breaker_trips_total")
+            elif change == "closed":
+                print("Site is responding again; resuming lookups")
+        return result, failed
+
+    async def lookup(plate):
+        retries = retry.retries if retry is not None else 0
+        for attempt_number in range(retries + 1):
+            if attempt_number:
+                delay = retry.delay(attempt_number)
+                print(f"Retrying plate {plate} in {delay:.1f} seconds (retry {attempt_number} of {retries})...")
+                metrics.increment("retries_total")
+                await asyncio.sleep(delay)
+            result, failed = await attempt(plate)
+            if not failed:
+                break
+
+        # A transient failure says nothing about the plate, so a later lookup should try again
+        if cache is not None and result and not is_transient_failure(result):
+            cache.put(plate, result)
+        return result
+
+    def completed(plate, result):
+        if result:
+            record_outcome(result)
+            if checkpoint is not None:
+                checkpoint.record(plate, result)
+        return result
+
+    pending = {}
+    # Plates with a lookup in flight, and how many more times each was pulled since
+    duplicates = {}
+
+    def start(plate):
+        # Returns the plate's result straight away if it needs no lookup
+        if plate in duplicates:
+            duplicates[plate] += 1
+            metrics.increment("coalesced_lookups_total")
+            return None
+
+        if checkpoint is not None and checkpoint.skip(plate):
+            return None
+
+        if cache is not None:
+            cached = cache.get(plate, max_age)
+            if cached is not None:
+                print(f"Using cached result for plate number: {plate}")
+                metrics.increment("cache_hits_total")
+                return completed(plate, {**cached, "Plate Number": plate})
+            metrics.increment("cache_misses_total")
+
+        pending[asyncio.ensure_future(lookup(plate))] = plate
+        duplicates[plate] = 0
+        return None
+
+    def finished(task):
+        plate = pending.pop(task)
+        return [completed(plate, task.result()) for _ in range(duplicates.pop(plate) + 1)]
+
+    is_async = hasattr(plate_numbers, "__aiter__")
+    source = plate_numbers.__aiter__() if is_async else iter(plate_numbers)
+    next_plate = None
+    exhausted = False
+    try:
+        while True:
+            # Don't pull the next plate until a slot is free
+            if not exhausted and len(pending) < (controller.limit if controller is not None else concurrency):
+                if not is_async:
+                    plate = next(source, None)
+                    if plate is None:
+                        exhausted = True
+                    else:
+                        result = start(plate)
+                        if result is not None:
+                            yield result
+                    continue
+                if next_plate is None:
+                    next_plate = asyncio.ensure_future(source.__anext__())
+
+            waiting = set(pending)
+            if next_plate is not None:
+                waiting.add(next_plate)
+            if not waiting:
+                break
+
+            # An async source may take a while to produce its next plate; keep
+            # yielding lookups that finish in the meantime
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not next_plate:
+                    for result in finished(task):
+                        yield result
+                    continue
+
+                next_plate = None
+                try:
+                    result = start(task.result())
+                except StopAsyncIteration:
+                    exhausted = True
+                    continue
+                if result is not None:
+                    yield result
+    finally:
+        if next_plate is not None:
+            next_plate.cancel()
+        for task in pending:
+            task.cancel()
+        executor.shutdown(wait=True)
+        pool.close()
+        if http_engine is not None:
+            http_engine.close()
+
+def check_multiple_registrations(plate_numbers, max_workers=4, recycle_after=DEFAULT_RECYCLE_AFTER,
+                                 engine="selenium", rate=None, cache=None, max_age=None, checkpoint=None, **options):
     """
     Check multiple vehicle registrations concurrently
-    
+
+    Synchronous wrapper around check_many for callers without an event loop.
+    Each distinct plate is looked up once, and its result is repeated for
+    every time it appears in `plate_numbers`.
+
     Args:
         plate_numbers: List of plate numbers to check
         max_workers: Maximum number of concurrent workers (default: 4)
-        
+        recycle_after: Lookups served by a browser session before it is restarted
+        engine: "selenium" or "http" (default: "selenium")
+        rate: Maximum lookups started per second, or None for no limit
+        cache: Optional ResultCache to answer from and store new results in
+        max_age: Ignore cached results older than this many seconds
+        checkpoint: Optional CheckpointJournal to skip completed plates and record new ones
+        options: Passed on to check_many, e.g. max_concurrency, retry or breaker
+
     Returns:
-        List of registration details dictionaries
-    """
-    print(f"Checking {len(plate_numbers)} plate numbers with {max_workers} concurrent workers...")
-    
-    results = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks and collect futures
-        futures = {executor.submit(check_registration, plate): plate for plate in plate_numbers}
-        
-        # Process results as they complete
-        for future in futures:
-            try:
-                result = future.result()
-                if result:
-                    results.append(result)
-            except Exception as e:
-                plate = futures[future]
-                print(f"Error processing plate {plate}: {e}")
-                results.append({"Plate Number": plate, "Status": "ERROR", "Message": str(e)})
-    
-    print(f"Completed checking {len(plate_numbers)} plate numbers")
-    return results
+        List of registration details dictionaries, in the order of
+        `plate_numbers`; plates `checkpoint` already held a result for are left out
+    """
+    unique_plates = list(dict.fromkeys(plate_numbers))
+    if len(unique_plates) < len(plate_numbers):
+        print(f"Skipping {len(plate_numbers) - len(unique_plates)} duplicate plate numbers")
+    print(f"Checking {len(unique_plates)} plate numbers with {max_workers} concurrent workers...")
+
+    async def collect():
+        return {result["Plate Number"]: result
+                async for result in check_many(unique_plates, concurrency=max_workers, rate=rate,
+                                               engine=engine, recycle_after=recycle_after,
+                                               cache=cache, max_age=max_age, checkpoint=checkpoint, **options)
+                if result}
+
+    results = asyncio.run(collect())
+
+    print(f"Completed checking {len(unique_plates)} plate numbers")
+    return [results[plate] for plate in plate_numbers if plate in results]
+
+def stream_registrations(plate_numbers, output_path, output_format=None, checkpoint=None, **options):
+    """
+    Check plates from any iterable, writing each result to a file as it completes
+
+    Results are not kept once written and plates are read only as lookups
+    finish, so memory stays flat however long the input is. When resuming from
+    a checkpoint, the results it already holds are written out first.
+
+    Args:
+        plate_numbers: Iterable of plate numbers, e.g. from read_plates
+        output_path: File to write results to
+        output_format: "jsonl" or "csv"; guessed from the extension if omitted
+        checkpoint: Optional CheckpointJournal to skip completed plates and record new ones
+        options: Passed on to check_many
+
+    Returns:
+        Counter of result statuses
+    """
+    writer = open_result_writer(output_path, output_format)
+    counts = Counter()
+
+    if checkpoint is not None:
+        for result in checkpoint.completed_results():
+            writer.write(result)
+            counts[result.get("Status", "UNKNOWN")] += 1
+
+    async def run():
+        async for result in check_many(plate_numbers, checkpoint=checkpoint, **options):
+            if result:
+                writer.write(result)
+                counts[result.get("Status", "UNKNOWN")] += 1
+
+    try:
+        asyncio.run(run())
+    finally:
+        writer.close()
+    return counts
+
+def read_plates(path):
+    """
+    Yield normalised plate numbers one per line from a file, or from stdin if the path is "-"
+    """
+    if path == "-":
+        for line in sys.stdin:
+            if line.strip():
+                yield normalise_plate(line)
+        return
+
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield normalise_plate(line)
+
+async def read_stdin_plates(preceding=(), buffered_lines=100):
+    """
+    Asynchronously yield normalised plate numbers from stdin, after any given first
+
+    A daemon thread reads stdin, so check_many keeps writing finished lookups
+    while a slow producer is idle. The thread stops reading once
+    `buffered_lines` lines are waiting, so memory stays flat.
+    """
+    for plate in preceding:
+        yield plate
+
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue(maxsize=buffered_lines)
+
+    def read():
+        try:
+            for line in sys.stdin:
+                asyncio.run_coroutine_threadsafe(lines.put(line), loop).result()
+            asyncio.run_coroutine_threadsafe(lines.put(None), loop).result()
+        except (RuntimeError, CancelledError):
+            return  # The batch ended before stdin did
+
+    threading.Thread(target=read, daemon=True).start()
+    while True:
+        line = await lines.get()
+        if line is None:
+            return
+        if line.strip():
+            yield normalise_plate(line)
+
+def print_summary_line(result):
+    """
+    Print a one-line summary of a registration result
+    """
+    plate = result.get("Plate Number", "Unknown")
+    if "Error" in result:
+        print(f"{plate}: Error - {result['Error']}")
+    elif result.get("Status") == "NOT FOUND":
+        print(f"{plate}: {result['Status']} - {result.get('Message', '')}")
+    elif result.get("Status") == "REGISTERED":
+        expiry = result.get("Expiry", "Unknown")
+        description = result.get("Description", "")
+        print(f"{plate}: {result['Status']}, Expiry: {expiry}, Vehicle: {description}")
+    else:
+        status = result.get("Status", "Unknown")
+        print(f"{plate}: {status}")
+
+def run_worker(queue_path, worker_id=None, concurrency=4, lease_seconds=DEFAULT_LEASE_SECONDS,
+               poll_interval=2.0, **options):
+    """
+    Check plates claimed from a WorkQueue until every plate in it is done
+
+    Plates are claimed a few at a time as lookup slots free up, so one warm
+    browser pool or HTTP engine serves the worker's whole run. Leases are
+    renewed by a background task every third of `lease_seconds` while the
+    worker is alive, even while every slot is busy with a slow lookup. When
+    the remaining plates are all held by other workers, this one keeps polling
+    in case one of them dies and its leases expire, and only stops once every
+    plate in the queue is done.
+
+    Args:
+        queue_path: SQLite file holding the queue
+        worker_id: Name recorded against claimed plates (default: host:pid)
+        concurrency: Maximum number of lookups in flight
+        lease_seconds: How long a claim lasts before another worker may take the plate
+        poll_interval: Seconds between checks for claimable plates when there are none
+        options: Passed on to check_many
+
+    Returns:
+        Number of plates this worker checked
+    """
+    queue = WorkQueue(queue_path, lease_seconds)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    job_ids = defaultdict(list)
+    checked = 0
+
+    async def renew_leases():
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            queue.renew(worker_id)
+
+    async def claimed_plates():
+        while True:
+            jobs = queue.claim(worker_id, limit=1)
+            if jobs:
+                job_id, plate = jobs[0]
+                job_ids[plate].append(job_id)
+                yield plate
+            elif queue.unfinished() == 0:
+                return
+            else:
+                await asyncio.sleep(poll_interval)
+
+    async def run():
+        nonlocal checked
+        renewer = asyncio.ensure_future(renew_leases())
+        try:
+            async for result in check_many(claimed_plates(), concurrency=concurrency, **options):
+                plate = result["Plate Number"]
+                queue.complete(job_ids[plate].pop(), plate, result, worker_id)
+                checked += 1
+        finally:
+            renewer.cancel()
+
+    print(f"Worker {worker_id} taking plates from {queue_path}...")
+    try:
+        asyncio.run(run())
+    finally:
+        queue.close()
+    return checked
+
+def coordinate(queue_path, plate_numbers, spawn_workers=0, worker_command=None, output_path=None,
+               output_format=None, poll_interval=1.0):
+    """
+    Queue plates, optionally start local workers, and collect results until the queue is done
+
+    Workers on other machines can join by running with --worker against the
+    same queue file. If every local worker exits while plates remain, a
+    replacement is started, up to three per requested worker.
+
+    Args:
+        queue_path: SQLite file holding the queue
+        plate_numbers: Iterable of plate numbers to add to the queue
+        spawn_workers: Number of local worker processes to start
+        worker_command: Command line that starts one worker
+        output_path: File to write results to; results are printed if omitted
+        output_format: "jsonl" or "csv"; guessed from the extension if omitted
+        poll_interval: Seconds between checks for new results
+
+    Returns:
+        Counter of result statuses
+    """
+    queue = WorkQueue(queue_path)
+    added = queue.enqueue(plate_numbers)
+    print(f"Added {added} plate numbers to {queue_path} ({queue.unfinished()} waiting)")
+
+    def spawn():
+        return subprocess.Popen(worker_command, stdout=subprocess.DEVNULL)
+
+    workers = [spawn() for _ in range(spawn_workers)]
+    if workers:
+        print(f"Started {len(workers)} worker processes")
+    respawns = 0
+
+    writer = open_result_writer(output_path, output_format) if output_path else None
+    counts = Counter()
+    cursor = 0
+    finished = False
+    try:
+        while True:
+            results, cursor = queue.results_after(cursor)
+            for result in results:
+                counts[result.get("Status", "UNKNOWN")] += 1
+                if writer is not None:
+                    writer.write(result)
+                else:
+                    print_summary_line(result)
+            if results:
+                continue
+            if finished:
+                break
+
+            if queue.unfinished() == 0:
+                # The last plates may have finished since the read above; read until nothing is left
+                finished = True
+                continue
+
+            if workers and all(worker.poll() is not None for worker in workers):
+                if respawns >= spawn_workers * 3:
+                    print(f"Workers keep exiting; {queue.unfinished()} plates are left in {queue_path}")
+                    break
+                print("Every worker has exited with plates left. Starting a replacement...")
+                workers.append(spawn())
+                respawns += 1
+
+            time.sleep(poll_interval)
+    finally:
+        if writer is not None:
+            writer.close()
+        for worker in workers:
+            worker.wait()
+        queue.close()
+    return counts
+
+def refresh_fleet(fleet, expiry_window=DEFAULT_EXPIRY_WINDOW, max_age_days=DEFAULT_MAX_AGE_DAYS,
+                  concurrency=4, **options):
+    """
+    Re-check the tracked plates whose registration could have changed
+
+    Only plates that FleetStore.due reports are looked up; every other
+    tracked plate is left alone.
+
+    Args:
+        fleet: FleetStore of tracked plates
+        expiry_window: Days before expiry from which plates are re-checked daily, as are expired plates
+        max_age_days: Days after which any plate is re-checked
+        concurrency: Maximum number of lookups in flight
+        options: Passed on to check_many
+
+    Returns:
+        (Counter of reasons plates were checked, list of status changes, number of failed checks)
+    """
+    due = fleet.due(expiry_window, max_age_days)
+
+    # A result cached earlier today is as good as a new lookup; an older one is not
+    if options.get("max_age") is None:
+        options["max_age"] = time.time() - time.mktime(date.today().timetuple())
+
+    reasons = Counter(reason for _, reason in due)
+    changes = []
+    failed = 0
+
+    async def run():
+        nonlocal failed
+        async for result in check_many((plate for plate, _ in due), concurrency=concurrency, **options):
+            if result.get("Status") in ("ERROR", "UNKNOWN"):
+                failed += 1
+            change = fleet.record(result["Plate Number"], result)
+            if change is not None:
+                changes.append(change)
+
+    if due:
+        asyncio.run(run())
+    return reasons, changes, failed
+
+def print_change(change):
+    """
+    Print one status change found by a fleet refresh
+    """
+    plate = change["Plate Number"]
+    if change["Old Status"] != change["New Status"]:
+        print(f"{plate}: {change['Old Status']} -> {change['New Status']}")
+    else:
+        print(f"{plate}: {change['New Status']}, expiry {change['Old Expiry'] or 'unknown'} -> "
+              f"{change['New Expiry'] or 'unknown'}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Check Queensland vehicle registration details")
     parser.add_argument("plate_number", nargs="*", help="The Queensland plate number(s) to check")
-    parser.add_argument("--file", "-f", help="File containing plate numbers (one per line)")
+    parser.add_argument("--file", "-f", help="File containing plate numbers (one per line), or - for stdin")
+    parser.add_argument("--output", "-o",
+                        help="Write each result to this file as it completes (.jsonl or .csv), streaming the input")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip plates from --file completed by an earlier run, retrying any that ended in ERROR")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR,
+                        help=f"Directory for the journals that --resume reads (default: {DEFAULT_CHECKPOINT_DIR})")
+    parser.add_argument("--format", choices=FORMATS, help="Output file format (default: from the --output extension)")
     parser.add_argument("--workers", "-w", type=int, default=4, help="Number of concurrent workers (default: 4)")
+    parser.add_argument("--recycle-after", type=int, default=DEFAULT_RECYCLE_AFTER,
+                        help=f"Restart each browser session after this many lookups (default: {DEFAULT_RECYCLE_AFTER})")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Start at --workers and adjust concurrency to what the site handles well")
+    parser.add_argument("--max-workers", type=int,
+                        help="Upper limit on concurrency with --adaptive (default: 4 times --workers)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Times to retry a plate whose lookup failed with a transient error (default: 2)")
+    parser.add_argument("--backoff", type=float, default=1.0,
+                        help="Longest wait in seconds before the first retry; doubles for each retry (default: 1)")
+    parser.add_argument("--breaker-threshold", type=int, default=5,
+                        help="Consecutive failures that pause the batch; 0 never pauses (default: 5)")
+    parser.add_argument("--breaker-cooldown", type=float, default=30.0,
+                        help="Seconds to pause the batch before trying the site again (default: 30)")
+    parser.add_argument("--lean", action="store_true",
+                        help="Run browsers without images, stylesheets, fonts or extensions, returning once the DOM is ready")
+    parser.add_argument("--engine", "-e", choices=ENGINES, default="selenium",
+                        help="Lookup engine: a headless browser, or plain HTTP form posts with Selenium as the fallback (default: selenium)")
+    parser.add_argument("--rate", "-r", type=float,
+                        help="Maximum lookups started per second across all workers (default: no limit)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help=f"SQLite file to cache results in (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--no-cache", action="store_true", help="Always query the site and don't store results")
+    parser.add_argument("--max-age", type=float,
+                        help="Ignore cached results older than this many seconds")
+    parser.add_argument("--ttl-registered", type=float, default=DEFAULT_TTLS["REGISTERED"],
+                        help=f"Seconds to cache registered results (default: {DEFAULT_TTLS['REGISTERED']})")
+    parser.add_argument("--ttl-not-found", type=float, default=DEFAULT_TTLS["NOT FOUND"],
+                        help=f"Seconds to cache not found results (default: {DEFAULT_TTLS['NOT FOUND']})")
+    parser.add_argument("--ttl-error", type=float, default=DEFAULT_TTLS["ERROR"],
+                        help=f"Seconds to cache errors about the plate number itself; transient errors are never cached (default: {DEFAULT_TTLS['ERROR']})")
+    parser.add_argument("--locators", default=DEFAULT_LOCATORS_PATH,
+                        help=f"File that remembers which locator found each page element (default: {DEFAULT_LOCATORS_PATH})")
+    parser.add_argument("--profile", action="store_true", help="Print how long each stage of the lookups took")
+    parser.add_argument("--metrics-file",
+                        help="Save lookup metrics when the run ends: Prometheus text for .prom/.txt, JSON otherwise")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve live metrics at http://127.0.0.1:PORT/metrics while the run is going")
+    parser.add_argument("--queue", help="SQLite work queue shared by coordinator and worker processes")
+    parser.add_argument("--worker", action="store_true",
+                        help="Check plates from --queue until it is empty, instead of plates given here")
+    parser.add_argument("--spawn-workers", type=int, default=0,
+                        help="With --queue, start this many local worker processes (default: 0)")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f"How long a worker's claim on a plate lasts (default: {DEFAULT_LEASE_SECONDS})")
+    parser.add_argument("--worker-id", help="Name for this worker in the queue (default: host:pid)")
+    parser.add_argument("--fleet", default=DEFAULT_FLEET_PATH,
+                        help=f"SQLite file of tracked plates for --track and --refresh (default: {DEFAULT_FLEET_PATH})")
+    parser.add_argument("--track", action="store_true", help="Add the plates given here to the tracked fleet")
+    parser.add_argument("--untrack", action="store_true", help="Remove the plates given here from the tracked fleet")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-check tracked plates that could have changed and print what changed")
+    parser.add_argument("--expiry-window", type=int, default=DEFAULT_EXPIRY_WINDOW,
+                        help=f"With --refresh, re-check plates that have expired or expire within this many days (default: {DEFAULT_EXPIRY_WINDOW})")
+    parser.add_argument("--refresh-after", type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help=f"With --refresh, re-check any plate last checked this many days ago (default: {DEFAULT_MAX_AGE_DAYS})")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run a lookup service that keeps engines warm and answers GET /plate/{n} and POST /plates")
+    parser.add_argument("--service-port", type=int, default=DEFAULT_SERVICE_PORT,
+                        help=f"Port of the lookup service on 127.0.0.1 (default: {DEFAULT_SERVICE_PORT})")
+    parser.add_argument("--local", action="store_true",
+                        help="Check plates in this process even if a lookup service is running")
+    parser.add_argument("--url", default=SEARCH_URL, help="Registration check page to use, e.g. a local stand-in server")
     args = parser.parse_args()
-    
+
+    SEARCH_URL = args.url
+    LEAN_BROWSER = args.lean
+    locator_registry = LocatorRegistry(args.locators)
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+        print(f"Serving metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache, ttls={
+            "REGISTERED": args.ttl_registered,
+            "NOT FOUND": args.ttl_not_found,
+            "ERROR": args.ttl_error,
+        })
+
+    lookup_options = {
+        "recycle_after": args.recycle_after,
+        "engine": args.engine,
+        "rate": args.rate,
+        "cache": cache,
+        "max_age": args.max_age,
+        "max_concurrency": (args.max_workers or args.workers * 4) if args.adaptive else None,
+        "retry": RetryPolicy(args.retries, base_delay=args.backoff),
+        "breaker": CircuitBreaker(args.breaker_threshold, args.breaker_cooldown) if args.breaker_threshold > 0 else None,
+    }
+
+    if args.serve:
+        service = LookupService(check_many, concurrency=args.workers, **lookup_options)
+        server = ServiceServer(service, args.service_port)
+        print(f"Lookup service running at http://127.0.0.1:{args.service_port}/ "
+              f"with the {args.engine} engine and {args.workers} workers. Press Ctrl+C to stop.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Stopping lookup service...")
+        finally:
+            server.server_close()
+            service.close()
+            if cache is not None:
+                cache.close()
+        sys.exit(0)
+
+    if args.worker:
+        if not args.queue:
+            parser.error("--worker needs --queue")
+        checked = run_worker(args.queue, worker_id=args.worker_id, concurrency=args.workers,
+                             lease_seconds=args.lease_seconds, **lookup_options)
+        print(f"Worker finished after checking {checked} plates")
+        sys.exit(0)
+
+    if args.queue:
+        # Local workers get the same lookup settings and share the rate limit between them
+        worker_command = [sys.executable, os.path.abspath(__file__), "--worker", "--queue", args.queue,
+                          "--workers", str(args.workers), "--engine", args.engine, "--url", SEARCH_URL,
+                          "--recycle-after", str(args.recycle_after), "--lease-seconds", str(args.lease_seconds),
+                          "--locators", args.locators, "--cache", args.cache,
+                          "--ttl-registered", str(args.ttl_registered), "--ttl-not-found", str(args.ttl_not_found),
+                          "--ttl-error", str(args.ttl_error)]
+        if args.rate and args.spawn_workers:
+            worker_command += ["--rate", str(args.rate / args.spawn_workers)]
+        if args.no_cache:
+            worker_command.append("--no-cache")
+        if args.lean:
+            worker_command.append("--lean")
+        if args.max_age is not None:
+            worker_command += ["--max-age", str(args.max_age)]
+        worker_command += ["--retries", str(args.retries), "--backoff", str(args.backoff),
+                           "--breaker-threshold", str(args.breaker_threshold),
+                           "--breaker-cooldown", str(args.breaker_cooldown)]
+        if args.adaptive:
+            worker_command += ["--adaptive", "--max-workers", str(args.max_workers or args.workers * 4)]
+
+        queued_plates = itertools.chain((normalise_plate(p) for p in args.plate_number if p.strip()),
+                                        read_plates(args.file) if args.file else [])
+        counts = coordinate(args.queue, queued_plates, spawn_workers=args.spawn_workers,
+                            worker_command=worker_command, output_path=args.output, output_format=args.format)
+
+        print(f"\nCollected {sum(counts.values())} results from {args.queue}")
+        print("-" * 50)
+        for status, count in counts.most_common():
+            print(f"{status}: {count}")
+        sys.exit(0)
+
+    if args.track or args.untrack or args.refresh:
+        fleet = FleetStore(args.fleet)
+        fleet_plates = itertools.chain((normalise_plate(p) for p in args.plate_number if p.strip()),
+                                       read_plates(args.file) if args.file else [])
+        if args.track:
+            print(f"Now tracking {fleet.add(fleet_plates)} more plates ({len(fleet)} in {args.fleet})")
+        elif args.untrack:
+            print(f"Stopped tracking {fleet.remove(fleet_plates)} plates ({len(fleet)} left in {args.fleet})")
+
+        if args.refresh:
+            tracked = len(fleet)
+            reasons, changes, failed = refresh_fleet(fleet, args.expiry_window, args.refresh_after,
+                                                     concurrency=args.workers, **lookup_options)
+            checked = sum(reasons.values())
+            print(f"\nChecked {checked} of {tracked} tracked plates; skipped {tracked - checked} that can't have changed")
+            if checked:
+                print(", ".join(f"{count} {reason}" for reason, count in reasons.most_common()))
+            if failed:
+                print(f"{failed} checks failed and will be retried on the next refresh")
+
+            print(f"\nChanges since the last refresh ({len(changes)}):")
+            print("-" * 50)
+            for change in sorted(changes, key=lambda change: change["Plate Number"]):
+                print_change(change)
+        fleet.close()
+
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+            print(f"Metrics written to {args.metrics_file}")
+        sys.exit(0)
+
     plate_numbers = []
-    
+
     # Collect plate numbers from command line arguments
     if args.plate_number:
-        plate_numbers.extend(args.plate_number)
-    
+        plate_numbers.extend(normalise_plate(p) for p in args.plate_number if p.strip())
+
+    # With an output file, stream plates from the file as lookups finish instead of loading them all
+    stream = bool(args.output and args.file)
+
     # Collect plate numbers from file if specified
-    if args.file:
+    if args.file and not stream:
         try:
-            with open(args.file, 'r') as f:
-                file_plates = [line.strip() for line in f if line.strip()]
-                plate_numbers.extend(file_plates)
-                print(f"Loaded {len(file_plates)} plate numbers from {args.file}")
+            file_plates = list(read_plates(args.file))
+            plate_numbers.extend(file_plates)
+            print(f"Loaded {len(file_plates)} plate numbers from {args.file}")
         except Exception as e:
             print(f"Error reading plate numbers from file: {e}")
-    
+
+    # Journal every result from a file run so it can be resumed if it dies
+    checkpoint = None
+    if args.file and args.file != "-":
+        try:
+            checkpoint = CheckpointJournal(journal_path_for(args.file, args.checkpoint_dir), resume=args.resume)
+            if args.resume:
+                print(f"Resuming from checkpoint {checkpoint.path} with {len(checkpoint)} plates already checked")
+        except OSError as e:
+            print(f"Error opening checkpoint journal: {e}")
+    elif args.resume:
+        print("--resume needs plate numbers from a --file. Starting from the beginning.")
+
     # If no plate numbers provided, prompt the user
-    if not plate_numbers:
+    if not plate_numbers and not stream:
         user_input = input("Enter Queensland plate number(s) separated by commas: ")
-        plate_numbers = [p.strip() for p in user_input.split(',') if p.strip()]
-    
+        plate_numbers = [normalise_plate(p) for p in user_input.split(',') if p.strip()]
+
+    # The service looks plates up with its own engine, site, cache, rate and retry settings
+    overrides_service = any(getattr(args, setting) != parser.get_default(setting) for setting in SERVICE_SETTINGS)
+
     # Check if we have any plate numbers to process
-    if plate_numbers:
+    if args.output and (plate_numbers or stream):
+        if not stream:
+            plate_source = plate_numbers
+        elif args.file == "-":
+            plate_source = read_stdin_plates(plate_numbers)
+        else:
+            plate_source = itertools.chain(plate_numbers, read_plates(args.file))
+        print(f"Streaming results to {args.output} with {args.workers} concurrent workers...")
+        counts = stream_registrations(plate_source, args.output, output_format=args.format,
+                                      concurrency=args.workers, checkpoint=checkpoint, **lookup_options)
+
+        print(f"\nWrote {sum(counts.values())} results to {args.output}")
+        print("-" * 50)
+        for status, count in counts.most_common():
+            print(f"{status}: {count}")
+        if cache is not None:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+    elif plate_numbers and not args.local and not overrides_service and service_running(args.service_port):
+        # A lookup service already has warm engines; let it do the lookups
+        pending = [plate for plate in plate_numbers if checkpoint is None or not checkpoint.skip(plate)]
+        results = []
+        if pending:
+            print(f"Forwarding {len(pending)} plate numbers to the lookup service on port {args.service_port}...")
+            try:
+                results = request_lookups(pending, args.service_port)
+            except Exception as e:
+                print(f"Error from the lookup service: {e}")
+
+        if len(plate_numbers) == 1:
+            for result in results:
+                print_registration_details(result["Plate Number"], result)
+        else:
+            print("\nSummary of Registration Checks:")
+            print("-" * 50)
+            for result in results:
+                print_summary_line(result)
+        for result in results:
+            record_outcome(result)
+            if checkpoint is not None:
+                checkpoint.record(result["Plate Number"], result)
+        if args.resume and checkpoint is not None:
+            print(f"Skipped {len(plate_numbers) - len(pending)} plates completed in an earlier run")
+    elif plate_numbers:
         if len(plate_numbers) == 1:
             # If only one plate number, use the original function
-            check_registration(plate_numbers[0])
+            plate = plate_numbers[0]
+            skipped = checkpoint is not None and checkpoint.skip(plate)
+            cached = cache.get(plate, args.max_age) if cache is not None and not skipped else None
+            if skipped:
+                print(f"Skipped plate number {plate}, completed in an earlier run")
+            elif cached is not None:
+                print(f"Using cached result for plate number: {plate}")
+                print_registration_details(plate, cached)
+                metrics.increment("cache_hits_total")
+                record_outcome(cached)
+                if checkpoint is not None:
+                    checkpoint.record(plate, cached)
+            else:
+                with metrics.span("lookup", engine=args.engine):
+                    if args.engine == "http":
+                        result = check_registration_http(HttpLookupEngine(SEARCH_URL), plate)
+                    else:
+                        result = check_registration(plate)
+                record_outcome(result)
+                if cache is not None:
+                    metrics.increment("cache_misses_total")
+                    if not is_transient_failure(result):
+                        cache.put(plate, result)
+                if checkpoint is not None:
+                    checkpoint.record(plate, result)
         else:
             # If multiple plate numbers, use the concurrent function
-            results = check_multiple_registrations(plate_numbers, max_workers=args.workers)
-            
+            results = check_multiple_registrations(plate_numbers, max_workers=args.workers, checkpoint=checkpoint,
+                                                   **lookup_options)
+
             # Display a summary of results
             print("\nSummary of Registration Checks:")
             print("-" * 50)
             for result in results:
-                plate = result.get("Plate Number", "Unknown")
-                if "Error" in result:
-                    print(f"{plate}: Error - {result['Error']}")
-                elif result.get("Status") == "NOT FOUND":
-                    print(f"{plate}: {result['Status']} - {result.get('Message', '')}")
-                elif result.get("Status") == "REGISTERED":
-                    expiry = result.get("Expiry", "Unknown")
-                    description = result.get("Description", "")
-                    print(f"{plate}: {result['Status']}, Expiry: {expiry}, Vehicle: {description}")
-                else:
-                    status = result.get("Status", "Unknown")
-                    print(f"{plate}: {status}")
+                print_summary_line(result)
+
+            if cache is not None:
+                print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+            if args.resume and checkpoint is not None:
+                skipped = len(plate_numbers) - len(results)
+                print(f"Skipped {skipped} plates completed in an earlier run")
     else:
         print("No plate numbers provided. Exiting.")
 
+    if checkpoint is not None:
+        checkpoint.close()
+
+    if args.profile:
+        print("\nStage Breakdown:")
+        print(metrics.profile_report())
+    if args.metrics_file:
+        metrics.write(args.metrics_file)
+        print(f"Metrics written to {args.metrics_file}")
@@ -0,0 +1,325 @@
+"""
+End-to-end throughput benchmark for the registration lookup engines
+
+Starts a local stand-in server (or uses --url), then runs a batch of lookups
+for every combination of engine and worker count and reports plates/sec,
+p50/p95/p99 latency, bytes received per lookup and peak memory. Each
+combination runs in a fresh process so its peak memory is its own. Peak memory
+is sampled across the whole process tree, so browsers and their drivers count
+too; this needs psutil or a Linux /proc, and otherwise falls back to the
+benchmark process alone. Results are written to a JSON file, and --baseline
+compares them with an earlier file, exiting non-zero on a regression so it can
+gate a deploy.
+
+    python benchmark.py --engines http selenium --workers 1 4 16 --plates 500 --output bench.json
+    python benchmark.py --baseline bench.json --output bench-new.json
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import stand_in_server
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+SEARCHER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Get-Registration.py")
+
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+# Seconds between memory samples of the process tree
+MEMORY_SAMPLE_INTERVAL = 0.2
+
+def load_searcher():
+    """
+    Import Get-Registration.py, whose file name is not a valid module name
+    """
+    spec = importlib.util.spec_from_file_location("get_registration", SEARCHER_PATH)
+    searcher = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(searcher)
+    return searcher
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def _proc_tree_rss(pid):
+    """
+    Sum the resident memory of a process and its descendants from /proc
+    """
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    children = defaultdict(list)
+    rss = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+            with open(f"/proc/{entry}/statm", "r") as f:
+                resident_pages = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            continue  # The process exited while we were reading it
+        # The command name can hold spaces and brackets, so the parent pid is found after its last ")"
+        parent = int(stat.rsplit(")", 1)[1].split()[1])
+        children[parent].append(int(entry))
+        rss[int(entry)] = resident_pages * page_size
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        total += rss.get(current, 0)
+        pending.extend(children[current])
+    return total
+
+def process_tree_rss(pid=None):
+    """
+    Resident memory in bytes of a process and all its descendants
+
+    Returns None when neither psutil nor /proc is available.
+    """
+    pid = pid or os.getpid()
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue  # Exited since it was listed
+        return total
+    if os.path.isdir("/proc"):
+        return _proc_tree_rss(pid)
+    return None
+
+class MemorySampler:
+    """
+    Sample the resident memory of this process tree on a background thread, keeping the peak
+
+    Use it as a context manager around the work to measure. `peak` is in
+    bytes, or None if the process tree's memory can't be read here.
+    """
+
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        rss = process_tree_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+def peak_memory_kb(sampler):
+    """
+    Peak memory of a run in kilobytes, from the process tree if it was sampled
+
+    Falls back to the benchmark process's own peak, or None on platforms with neither.
+    """
+    if sampler.peak is not None:
+        return sampler.peak // 1024
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+    return None
+
+def run_once(search_url, engine, workers, plates, rate=None, lean=False):
+    """
+    Check `plates` synthetic plate numbers and measure throughput and latency
+
+    Latency is measured from the moment check_many takes a plate to the moment
+    its result comes back, so it excludes time spent queued for a worker.
+    """
+    searcher = load_searcher()
+    searcher.SEARCH_URL = search_url
+    searcher.LEAN_BROWSER = lean
+
+    started = {}
+    latencies = []
+    statuses = Counter()
+
+    def plate_numbers():
+        for i in range(plates):
+            plate = f"B{i:06d}"
+            started[plate] = time.perf_counter()
+            yield plate
+
+    async def run():
+        async for result in searcher.check_many(plate_numbers(), concurrency=workers, rate=rate, engine=engine):
+            latencies.append(time.perf_counter() - started.pop(result["Plate Number"]))
+            statuses[result.get("Status", "UNKNOWN")] += 1
+
+    # The searcher reports every lookup on stdout; keep it out of the benchmark output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), MemorySampler() as memory:
+        start = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+    received = sum(counter["value"] for counter in searcher.metrics.summary()["counters"]
+                   if counter["name"] == "bytes_received_total")
+
+    latencies.sort()
+    return {
+        "engine": engine,
+        "lean": lean,
+        "workers": workers,
+        "plates": plates,
+        "seconds": round(elapsed, 3),
+        "plates_per_sec": round(plates / elapsed, 2) if elapsed else None,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "statuses": dict(statuses),
+        "bytes_per_lookup": round(received / plates) if plates else None,
+        "peak_memory_kb": peak_memory_kb(memory),
+    }
+
+def run_in_subprocess(search_url, engine, workers, plates, rate=None, lean=False):
+    """
+    Run one benchmark in a fresh interpreter and return its result dictionary
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--run-one",
+               "--url", search_url, "--engines", engine, "--workers", str(workers), "--plates", str(plates)]
+    if rate:
+        command += ["--rate", str(rate)]
+    if lean:
+        command.append("--lean")
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise Exception(f"Benchmark run failed for {engine} with {workers} workers:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare(runs, baseline_runs, tolerance):
+    """
+    Print each run next to its baseline and return the runs that regressed
+
+    A run regresses if its throughput drops, or its p95 latency rises, by more
+    than `tolerance` (a fraction) against the baseline run with the same
+    engine, browser profile and worker count.
+    """
+    baseline = {(run["engine"], run.get("lean", False), run["workers"]): run for run in baseline_runs}
+    regressions = []
+    for run in runs:
+        before = baseline.get((run["engine"], run.get("lean", False), run["workers"]))
+        if before is None or not before.get("plates_per_sec") or not before.get("latency_p95"):
+            continue
+
+        throughput_change = run["plates_per_sec"] / before["plates_per_sec"] - 1
+        latency_change = run["latency_p95"] / before["latency_p95"] - 1
+        regressed = throughput_change < -tolerance or latency_change > tolerance
+        if regressed:
+            regressions.append(run)
+        print(f"{run['engine']:>8} x{run['workers']:<4} plates/sec {throughput_change:+.1%}, "
+              f"p95 {latency_change:+.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark registration lookup throughput against a stand-in server")
+    parser.add_argument("--engines", nargs="+", default=["http"], help="Engines to benchmark (default: http)")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4, 16],
+                        help="Worker counts to benchmark (default: 1 4 16)")
+    parser.add_argument("--plates", "-n", type=int, default=200, help="Plates to check per run (default: 200)")
+    parser.add_argument("--rate", type=float, help="Maximum lookups started per second (default: no limit)")
+    parser.add_argument("--lean", action="store_true", help="Use lean browsers for the selenium engine")
+    parser.add_argument("--url", help="Check page to benchmark against (default: start a local stand-in server)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stand-in server response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of searches the stand-in fails")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT, help=f"JSON results file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed fractional drop in plates/sec or rise in p95 latency (default: 0.10)")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_once(args.url, args.engines[0], args.workers[0], args.plates, args.rate, args.lean)))
+        sys.exit(0)
+
+    conditions = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "failure_rate": args.failure_rate,
+    }
+    server = None
+    search_url = args.url
+    if search_url is None:
+        server = stand_in_server.start_server(**conditions)
+        search_url = server.search_url
+
+    runs = []
+    try:
+        for engine in args.engines:
+            for workers in args.workers:
+                run = run_in_subprocess(search_url, engine, workers, args.plates, args.rate, args.lean)
+                runs.append(run)
+                peak = f"{run['peak_memory_kb'] / 1024:.1f} MB" if run["peak_memory_kb"] is not None else "unknown"
+                print(f"{engine:>8} x{workers:<4} {run['plates_per_sec']:>8} plates/sec  "
+                      f"p50 {run['latency_p50']:.3f}s  p95 {run['latency_p95']:.3f}s  p99 {run['latency_p99']:.3f}s  "
+                      f"{run['bytes_per_lookup'] / 1024:.1f} KB/lookup  peak {peak}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "url": args.url or "stand-in",
+        "server": conditions if server is not None else None,
+        "runs": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline_runs = json.load(f)["runs"]
+        print(f"\nCompared with {args.baseline}:")
+        if compare(runs, baseline_runs, args.tolerance):
+            sys.exit(1)
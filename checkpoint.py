@@ -0,0 +1,126 @@
+"""
+Append-only checkpoint journal for batch runs
+
+Every completed lookup is appended to a JSON Lines journal named after a hash
+of the input file. If a run dies, the next run with --resume skips plates the
+journal already has a result for, re-queuing only those that ended in ERROR.
+A line torn by a crash is ignored when the journal is read back.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+DEFAULT_CHECKPOINT_DIR = ".checkpoints"
+
+# Seconds between fsyncs; every record is flushed to the OS as it is written
+FSYNC_INTERVAL = 1.0
+
+def file_digest(path):
+    """
+    Return a short SHA-256 hex digest of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def journal_path_for(input_path, checkpoint_dir=DEFAULT_CHECKPOINT_DIR):
+    """
+    Return the journal file used for an input file
+    """
+    return os.path.join(checkpoint_dir, f"{file_digest(input_path)}.jsonl")
+
+class CheckpointJournal:
+    """
+    Records the result of each plate as it completes
+
+    Args:
+        path: Journal file
+        resume: Keep and load an existing journal instead of starting a new one
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        # Final status of each plate checked by earlier runs
+        self._status = {}
+        # Journalled results of finished plates not yet matched to a plate in this run's input
+        self._unmatched = Counter()
+        self._last_sync = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if resume and os.path.exists(path):
+            for plate, result in self._read():
+                self._status[plate] = result.get("Status", "UNKNOWN")
+                if result.get("Status") != "ERROR":
+                    self._unmatched[plate] += 1
+
+        self._file = open(path, "a" if resume else "w", buffering=1, encoding="utf-8")
+
+        # Start on a fresh line if the last run died part-way through writing one
+        if self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def _read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    yield record["plate"], record["result"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    def __len__(self):
+        return len(self._status)
+
+    def is_done(self, plate_number):
+        """
+        True if an earlier run already got a result other than ERROR for the plate
+        """
+        status = self._status.get(plate_number)
+        return status is not None and status != "ERROR"
+
+    def skip(self, plate_number):
+        """
+        True if this occurrence of a plate in the input was answered by an earlier run
+
+        Each journalled result stands in for one occurrence, so a plate listed
+        twice whose second lookup never finished is checked again. Results
+        recorded during this run don't count.
+        """
+        if self.is_done(plate_number) and self._unmatched[plate_number] > 0:
+            self._unmatched[plate_number] -= 1
+            return True
+        return False
+
+    def completed_results(self):
+        """
+        Yield every journalled result other than ERROR for the plates that are done
+        """
+        for plate, result in self._read():
+            if self.is_done(plate) and result.get("Status") != "ERROR":
+                yield result
+
+    def record(self, plate_number, result):
+        """
+        Append a plate's result to the journal
+        """
+        self._file.write(json.dumps({"plate": plate_number, "result": result}) + "\n")
+
+        now = time.monotonic()
+        if now - self._last_sync >= FSYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def close(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
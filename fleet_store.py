@@ -0,0 +1,171 @@
+"""
+Tracked fleet of plates for incremental, expiry-aware refreshes
+
+Each tracked plate keeps its last status, registration expiry and when it was
+last checked. A refresh only looks up the plates whose result could have
+changed since then: plates never checked, plates whose last check failed,
+plates whose expiry date is past or within a window of today (when a renewal
+or lapse shows up), and plates not checked for longer than a maximum age.
+Every status or expiry change a refresh finds is kept in a history table.
+"""
+import json
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+DEFAULT_FLEET_PATH = "fleet.db"
+
+# Days before the expiry date from which a plate is re-checked daily, until it is renewed
+DEFAULT_EXPIRY_WINDOW = 14
+
+# Days after which a plate is re-checked whatever its expiry
+DEFAULT_MAX_AGE_DAYS = 30
+
+# Results that say nothing about the registration, so the last known status stands
+FAILED_STATUSES = ("ERROR", "UNKNOWN")
+
+def parse_expiry(text):
+    """
+    Parse a dd/mm/yyyy expiry date, returning None if it can't be read
+    """
+    try:
+        return datetime.strptime(str(text).strip(), "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+def format_expiry(iso_date):
+    """
+    Turn a stored yyyy-mm-dd expiry back into dd/mm/yyyy
+    """
+    if not iso_date:
+        return None
+    return date.fromisoformat(iso_date).strftime("%d/%m/%Y")
+
+class FleetStore:
+    """
+    SQLite store of tracked plates, their last results and their status changes
+
+    Args:
+        path: SQLite file holding the fleet
+    """
+
+    def __init__(self, path=DEFAULT_FLEET_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plates ("
+            "plate TEXT PRIMARY KEY, added_at REAL NOT NULL, status TEXT, expiry TEXT, "
+            "checked_at REAL, last_error TEXT, result TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS plates_expiry ON plates (expiry)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS plates_checked_at ON plates (checked_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "id INTEGER PRIMARY KEY, plate TEXT NOT NULL, changed_at REAL NOT NULL, "
+            "old_status TEXT, new_status TEXT, old_expiry TEXT, new_expiry TEXT)"
+        )
+        self._db.commit()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM plates").fetchone()[0]
+
+    def add(self, plate_numbers):
+        """
+        Start tracking plates, ignoring any already tracked
+
+        Returns the number of plates added.
+        """
+        before = self._db.total_changes
+        now = time.time()
+        self._db.executemany("INSERT OR IGNORE INTO plates (plate, added_at) VALUES (?, ?)",
+                             ((plate, now) for plate in plate_numbers))
+        self._db.commit()
+        return self._db.total_changes - before
+
+    def remove(self, plate_numbers):
+        """
+        Stop tracking plates
+
+        Returns the number of plates removed.
+        """
+        before = self._db.total_changes
+        self._db.executemany("DELETE FROM plates WHERE plate = ?", ((plate,) for plate in plate_numbers))
+        self._db.commit()
+        return self._db.total_changes - before
+
+    def due(self, expiry_window=DEFAULT_EXPIRY_WINDOW, max_age_days=DEFAULT_MAX_AGE_DAYS, today=None):
+        """
+        Return the plates that need checking, as (plate, reason) tuples
+
+        The reason is "new", "failed", "expiring" or "stale". Plates that have
+        expired or expire within `expiry_window` days are checked at most once
+        a day.
+        """
+        today = today or date.today()
+        start_of_today = time.mktime(today.timetuple())
+        rows = self._db.execute(
+            "SELECT plate, reason FROM ("
+            " SELECT plate, CASE"
+            "  WHEN checked_at IS NULL THEN 'new'"
+            "  WHEN last_error IS NOT NULL THEN 'failed'"
+            "  WHEN expiry <= ? AND checked_at < ? THEN 'expiring'"
+            "  WHEN checked_at < ? THEN 'stale'"
+            " END AS reason FROM plates"
+            ") WHERE reason IS NOT NULL ORDER BY plate",
+            (
+                (today + timedelta(days=expiry_window)).isoformat(),
+                start_of_today,
+                time.time() - max_age_days * 24 * 60 * 60,
+            ),
+        )
+        return rows.fetchall()
+
+    def record(self, plate_number, result):
+        """
+        Store a plate's latest result
+
+        A failed check leaves the last known status and expiry in place.
+        Returns a dictionary describing the change if the status or expiry
+        moved, otherwise None.
+        """
+        now = time.time()
+        row = self._db.execute("SELECT status, expiry FROM plates WHERE plate = ?", (plate_number,)).fetchone()
+        if row is None:
+            return None
+        old_status, old_expiry = row
+
+        status = result.get("Status", "UNKNOWN")
+        if status in FAILED_STATUSES:
+            self._db.execute("UPDATE plates SET checked_at = ?, last_error = ? WHERE plate = ?",
+                             (now, result.get("Message") or status, plate_number))
+            self._db.commit()
+            return None
+
+        expiry = parse_expiry(result.get("Expiry", ""))
+        expiry = expiry.isoformat() if expiry else None
+        self._db.execute(
+            "UPDATE plates SET status = ?, expiry = ?, checked_at = ?, last_error = NULL, result = ? WHERE plate = ?",
+            (status, expiry, now, json.dumps(result), plate_number),
+        )
+
+        change = None
+        if old_status is not None and (old_status, old_expiry) != (status, expiry):
+            self._db.execute(
+                "INSERT INTO changes (plate, changed_at, old_status, new_status, old_expiry, new_expiry) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (plate_number, now, old_status, status, old_expiry, expiry),
+            )
+            change = {
+                "Plate Number": plate_number,
+                "Old Status": old_status,
+                "New Status": status,
+                "Old Expiry": format_expiry(old_expiry),
+                "New Expiry": format_expiry(expiry),
+            }
+        self._db.commit()
+        return change
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,217 @@
+"""
+Browserless registration lookups that replay the JSF form posts over plain HTTP
+
+The Queensland Transport check is two form submissions: accepting the Terms of
+Use (termsForm) and searching for a plate (vehicleSearchForm). This engine
+fetches each page, copies the form's hidden fields (including
+javax.faces.ViewState), and posts it back over a persistent, cookie-carrying
+connection. Results come back in the same dictionary shape as the Selenium
+lookup in Get-Registration.py.
+"""
+import gzip
+import http.client
+import threading
+import urllib.parse
+
+from metrics import metrics
+from registration_parser import extract_results, parse_page
+
+SEARCH_URL = "https://www.service.transport.qld.gov.au/checkrego/application/VehicleSearch.xhtml"
+
+TERMS_FORM = "termsForm"
+TERMS_BUTTON = "termsForm:acceptButton"
+SEARCH_FORM = "vehicleSearchForm"
+PLATE_FIELD = "vehicleSearchForm:plateNumber"
+SEARCH_BUTTON = "vehicleSearchForm:confirmButton"
+VIEW_STATE = "javax.faces.ViewState"
+
+MAX_REDIRECTS = 5
+
+class PageChangedError(Exception):
+    """
+    Raised when a page no longer has the forms or fields this engine relies on
+    """
+
+class HttpSession:
+    """
+    One JSF session: a persistent connection plus its cookies
+
+    A session is not thread-safe; HttpLookupEngine gives each thread its own.
+    """
+
+    def __init__(self, search_url=SEARCH_URL, timeout=15):
+        self.search_url = search_url
+        self.timeout = timeout
+        self.cookies = {}
+        self.requests_made = 0
+        self._connection = None
+        self._origin = None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self, parts):
+        origin = (parts.scheme, parts.netloc)
+        if self._connection is not None and self._origin == origin:
+            return self._connection
+
+        self.close()
+        if parts.scheme == "https":
+            self._connection = http.client.HTTPSConnection(parts.netloc, timeout=self.timeout)
+        else:
+            self._connection = http.client.HTTPConnection(parts.netloc, timeout=self.timeout)
+        self._origin = origin
+        return self._connection
+
+    def _send(self, method, url, body=None):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        headers = {"Accept-Encoding": "gzip", "User-Agent": "Queensland-Plate-Searcher"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        # A kept-alive connection may have been closed by the server; retry once on a fresh one
+        for attempt in range(2):
+            connection = self._connect(parts)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt:
+                    raise
+        self.requests_made += 1
+        metrics.increment("http_requests_total", code=response.status)
+        metrics.increment("bytes_received_total", len(content), engine="http")
+
+        for header in response.headers.get_all("Set-Cookie") or []:
+            name, _, value = header.split(";", 1)[0].partition("=")
+            if name.strip():
+                self.cookies[name.strip()] = value.strip()
+
+        if response.getheader("Connection", "").lower() == "close":
+            self.close()
+
+        if response.getheader("Content-Encoding", "").lower() == "gzip":
+            content = gzip.decompress(content)
+        return response, content
+
+    def fetch(self, url, fields=None):
+        """
+        GET a page, or POST form fields to it, following redirects
+
+        Returns the final URL and the parsed page.
+        """
+        method = "GET"
+        body = None
+        if fields is not None:
+            method = "POST"
+            body = urllib.parse.urlencode(fields)
+
+        for _ in range(MAX_REDIRECTS + 1):
+            response, content = self._send(method, url, body)
+            if response.status in (301, 302, 303, 307, 308):
+                url = urllib.parse.urljoin(url, response.getheader("Location", ""))
+                if response.status not in (307, 308):
+                    method, body = "GET", None
+                continue
+            if response.status >= 400:
+                raise Exception(f"HTTP {response.status} from {url}")
+            charset = response.headers.get_content_charset() or "utf-8"
+            with metrics.span("parse", engine="http"):
+                return url, parse_page(content.decode(charset, errors="replace"))
+
+        raise Exception(f"Too many redirects from {url}")
+
+    def submit(self, page_url, page, form_id, button, values=None):
+        """
+        Post a form back with its hidden fields, the pressed button and any new values
+        """
+        form = page.forms.get(form_id)
+        if form is None:
+            raise PageChangedError(f"Form '{form_id}' not found")
+        if VIEW_STATE not in form["fields"]:
+            raise PageChangedError(f"Form '{form_id}' has no {VIEW_STATE}")
+
+        fields = dict(form["fields"])
+        fields.update(values or {})
+        fields[button] = form["buttons"].get(button) or button
+
+        action = urllib.parse.urljoin(page_url, form["action"] or page_url)
+        return self.fetch(action, fields)
+
+    def check_registration(self, plate_number):
+        """
+        Accept the terms if needed, search for a plate and return its details
+
+        Raises PageChangedError if the pages no longer match what is expected.
+        """
+        with metrics.span("page_load", engine="http"):
+            url, page = self.fetch(self.search_url)
+
+        if SEARCH_FORM not in page.forms:
+            if TERMS_FORM not in page.forms:
+                raise PageChangedError("Neither the Terms of Use nor the search form was found")
+            with metrics.span("terms", engine="http"):
+                url, page = self.submit(url, page, TERMS_FORM, TERMS_BUTTON)
+
+        form = page.forms.get(SEARCH_FORM)
+        if form is None or PLATE_FIELD not in form["fields"]:
+            raise PageChangedError("Search form or plate number field not found")
+
+        with metrics.span("search_submit", engine="http"):
+            url, page = self.submit(url, page, SEARCH_FORM, SEARCH_BUTTON, {PLATE_FIELD: plate_number})
+
+        registration_details = extract_results(page, plate_number)
+        if registration_details is None:
+            raise PageChangedError("Result page had no registration details or messages")
+        return registration_details
+
+class HttpLookupEngine:
+    """
+    Thread-safe front end that gives each worker thread its own HttpSession
+
+    Sessions stay open between lookups, so the connection and the accepted
+    Terms of Use are reused for every plate a thread checks.
+    """
+
+    def __init__(self, search_url=SEARCH_URL, timeout=15):
+        self.search_url = search_url
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = HttpSession(self.search_url, self.timeout)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def check_registration(self, plate_number):
+        session = self.session()
+        try:
+            return session.check_registration(plate_number)
+        except Exception:
+            # Start the next lookup on this thread with a clean JSF session
+            session.close()
+            session.cookies.clear()
+            raise
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
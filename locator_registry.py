@@ -0,0 +1,59 @@
+"""
+Remembers which locator strategy last found each page element
+
+Finding an element by a strategy that no longer matches costs a WebDriver
+round trip, so the strategy that worked last time is tried first. The
+choices are saved to a JSON file so they carry over between runs.
+"""
+import json
+import os
+import threading
+
+DEFAULT_LOCATORS_PATH = "locators.json"
+
+class LocatorRegistry:
+    """
+    Thread-safe map from element name to the strategy that last located it
+
+    Args:
+        path: JSON file to load and save choices in, or None to keep them in memory
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._preferred = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self._preferred = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable locator file {path}: {e}")
+
+    def order(self, element, strategies):
+        """
+        Return (name, finder) strategies with the last successful one first
+        """
+        preferred = self._preferred.get(element)
+        return sorted(strategies, key=lambda strategy: strategy[0] != preferred)
+
+    def record(self, element, strategy_name):
+        """
+        Remember that a strategy located an element, saving if the choice changed
+        """
+        with self._lock:
+            if self._preferred.get(element) == strategy_name:
+                return
+            self._preferred[element] = strategy_name
+            if self.path:
+                self._save()
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(self._preferred, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save locator file {self.path}: {e}")
@@ -0,0 +1,257 @@
+"""
+Long-running lookup service with a local HTTP/JSON API
+
+The service keeps one check_many batch running for its whole life, fed from
+an asyncio queue, so the browser pool or HTTP sessions, the rate limit, the
+adaptive concurrency limit and the circuit breaker are all shared by every
+caller and stay warm between requests. Requests for a plate that is already
+being looked up wait for that lookup instead of starting another.
+
+    GET  /plate/ABC123                        -> one result
+    POST /plates  {"plates": ["ABC123", ...]} -> {"results": [...]} in request order
+    GET  /health                              -> {"status": "ok", ...}
+    GET  /metrics, /metrics.json              -> lookup metrics
+
+The service only listens on 127.0.0.1. The client functions at the bottom
+let the CLI forward its lookups to a running service.
+"""
+import asyncio
+import concurrent.futures
+import json
+import threading
+import traceback
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import metrics
+from result_cache import normalise_plate
+
+DEFAULT_SERVICE_PORT = 8765
+
+# Seconds a request waits for its lookups before the service gives up on it
+REQUEST_TIMEOUT = 600
+
+class LookupService:
+    """
+    Runs a check_many batch on a background event loop and answers lookups from it
+
+    Args:
+        check_many: The check_many async generator function to run
+        options: Passed on to check_many, e.g. concurrency, engine, rate or cache
+    """
+
+    def __init__(self, check_many, **options):
+        self._check_many = check_many
+        self._options = options
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._queue = None
+        self._stopped = False
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._serve())
+        self._loop.close()
+
+    async def _plates(self):
+        while True:
+            plate = await self._queue.get()
+            if plate is None:
+                return
+            yield plate
+
+    async def _serve(self):
+        self._queue = asyncio.Queue()
+        self._started.set()
+        try:
+            async for result in self._check_many(self._plates(), **self._options):
+                if result:
+                    self._resolve(result["Plate Number"], result)
+        except Exception as e:
+            print(f"Lookup service stopped after an error: {e}")
+            traceback.print_exc()
+        finally:
+            # The batch has ended; nothing still waiting will get an answer
+            with self._lock:
+                self._stopped = True
+                waiters, self._waiters = self._waiters, {}
+            for futures in waiters.values():
+                for future in futures:
+                    future.set_exception(Exception("The lookup service has stopped"))
+
+    def _resolve(self, plate_number, result):
+        with self._lock:
+            futures = self._waiters.pop(plate_number, [])
+        for future in futures:
+            future.set_result(result)
+
+    @property
+    def running(self):
+        """
+        True while the background batch is still taking lookups
+        """
+        with self._lock:
+            return not self._stopped and self._thread.is_alive()
+
+    @property
+    def in_flight(self):
+        """
+        Number of distinct plates waiting for a result
+        """
+        with self._lock:
+            return len(self._waiters)
+
+    def check(self, plate_numbers, timeout=REQUEST_TIMEOUT):
+        """
+        Look up plates and return their results in the order given
+
+        Plate numbers are normalised first, so "abc 123" and "ABC123" share a
+        lookup, as do requests for a plate whose lookup is already in flight.
+        Safe to call from any thread. Raises concurrent.futures.TimeoutError
+        if the results take longer than `timeout` seconds, or Exception if
+        the service has stopped.
+        """
+        futures = []
+        with self._lock:
+            if self._stopped:
+                raise Exception("The lookup service has stopped")
+            for plate in map(normalise_plate, plate_numbers):
+                future = concurrent.futures.Future()
+                waiting = self._waiters.setdefault(plate, [])
+                waiting.append(future)
+                if len(waiting) == 1:
+                    self._loop.call_soon_threadsafe(self._queue.put_nowait, plate)
+                futures.append(future)
+
+        done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        if not_done:
+            raise concurrent.futures.TimeoutError(f"{len(not_done)} lookups did not finish in {timeout} seconds")
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+        Let lookups in flight finish, then shut the engines down
+        """
+        with self._lock:
+            if not self._stopped:
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        self._thread.join()
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _lookup(self, plate_numbers):
+        try:
+            return self.server.service.check(plate_numbers)
+        except concurrent.futures.TimeoutError as e:
+            self._send(504, {"error": str(e)})
+        except Exception as e:
+            self._send(503, {"error": str(e)})
+        return None
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path.startswith("/plate/"):
+            plate = urllib.parse.unquote(path[len("/plate/"):]).strip()
+            if not plate:
+                self._send(400, {"error": "No plate number given"})
+                return
+            results = self._lookup([plate])
+            if results is not None:
+                self._send(200, results[0])
+        elif path == "/health":
+            if self.server.service.running:
+                self._send(200, {"status": "ok", "in_flight": self.server.service.in_flight})
+            else:
+                self._send(503, {"status": "stopped"})
+        elif path == "/metrics":
+            self._send(200, metrics.prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/metrics.json":
+            self._send(200, metrics.summary())
+        else:
+            self._send(404, {"error": f"Unknown path {path}"})
+
+    def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path != "/plates":
+            self._send(404, {"error": f"Unknown path {path}"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            self._send(400, {"error": "Body is not valid JSON"})
+            return
+
+        plates = body.get("plates") if isinstance(body, dict) else body
+        if not isinstance(plates, list) or not all(isinstance(plate, str) and plate.strip() for plate in plates):
+            self._send(400, {"error": 'Expected {"plates": ["ABC123", ...]}'})
+            return
+
+        results = self._lookup(plates)
+        if results is not None:
+            self._send(200, {"results": results})
+
+class ServiceServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP front end for a LookupService
+    """
+
+    daemon_threads = True
+
+    def __init__(self, service, port=DEFAULT_SERVICE_PORT, verbose=False):
+        super().__init__(("127.0.0.1", port), _ServiceHandler)
+        self.service = service
+        self.verbose = verbose
+
+def service_url(port=DEFAULT_SERVICE_PORT):
+    return f"http://127.0.0.1:{port}"
+
+def service_running(port=DEFAULT_SERVICE_PORT, timeout=0.5):
+    """
+    True if a lookup service answers its health check on `port`
+    """
+    try:
+        with urllib.request.urlopen(f"{service_url(port)}/health", timeout=timeout) as response:
+            return json.load(response).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+
+def request_lookups(plate_numbers, port=DEFAULT_SERVICE_PORT, timeout=REQUEST_TIMEOUT):
+    """
+    Ask a running lookup service for plates' results, returned in the order given
+    """
+    body = json.dumps({"plates": list(plate_numbers)}).encode("utf-8")
+    request = urllib.request.Request(f"{service_url(port)}/plates", data=body,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)["results"]
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.load(e).get("error")
+        except ValueError:
+            message = None
+        raise Exception(f"Lookup service returned HTTP {e.code}: {message or e.reason}")
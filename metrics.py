@@ -0,0 +1,216 @@
+"""
+Timing spans and counters for lookups
+
+Each stage of a lookup (browser start-up, page load, Terms of Use, search
+submit, parsing, ...) is timed with metrics.span(), outcomes such as
+result statuses and locator fallbacks are counted with metrics.increment(),
+and current values such as the concurrency limit are set with metrics.gauge().
+The totals can be printed as a stage breakdown, saved as JSON, or served in
+the Prometheus text format.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the Prometheus histogram buckets for stage durations
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Metrics:
+    """
+    Thread-safe store of stage timings, counters and gauges
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._stages = {}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._stages.clear()
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """
+        Time the enclosed block as one occurrence of a stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def observe(self, stage, seconds, **labels):
+        """
+        Record a duration for a stage
+        """
+        key = (stage, _label_key(labels))
+        with self._lock:
+            timing = self._stages.get(key)
+            if timing is None:
+                timing = {"count": 0, "total": 0.0, "max": 0.0, "buckets": [0] * len(DURATION_BUCKETS)}
+                self._stages[key] = timing
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    timing["buckets"][i] += 1
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Add to a counter
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, value, **labels):
+        """
+        Set a gauge to its current value
+        """
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def summary(self):
+        """
+        Return all counters, gauges and stage timings as a JSON-serialisable dictionary
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            gauges = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._gauges.items())
+            ]
+            stages = [
+                {
+                    "stage": stage,
+                    "labels": dict(labels),
+                    "count": timing["count"],
+                    "total_seconds": round(timing["total"], 6),
+                    "mean_seconds": round(timing["total"] / timing["count"], 6),
+                    "max_seconds": round(timing["max"], 6),
+                }
+                for (stage, labels), timing in sorted(self._stages.items())
+            ]
+        return {"counters": counters, "gauges": gauges, "stages": stages}
+
+    def prometheus(self):
+        """
+        Render all counters, gauges and stage timings in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE plate_searcher_{name} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"plate_searcher_{name}{_format_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self._gauges}):
+                lines.append(f"# TYPE plate_searcher_{name} gauge")
+                for (gauge, labels), value in sorted(self._gauges.items()):
+                    if gauge == name:
+                        lines.append(f"plate_searcher_{name}{_format_labels(labels)} {value}")
+
+            if self._stages:
+                lines.append("# TYPE plate_searcher_stage_duration_seconds histogram")
+            for (stage, labels), timing in sorted(self._stages.items()):
+                base = list(labels) + [("stage", stage)]
+                for bound, count in zip(DURATION_BUCKETS, timing["buckets"]):
+                    lines.append(f"plate_searcher_stage_duration_seconds_bucket"
+                                 f"{_format_labels(base, [('le', bound)])} {count}")
+                lines.append(f"plate_searcher_stage_duration_seconds_bucket"
+                             f"{_format_labels(base, [('le', '+Inf')])} {timing['count']}")
+                lines.append(f"plate_searcher_stage_duration_seconds_sum{_format_labels(base)} {timing['total']:.6f}")
+                lines.append(f"plate_searcher_stage_duration_seconds_count{_format_labels(base)} {timing['count']}")
+        return "\n".join(lines) + "\n"
+
+    def profile_report(self):
+        """
+        Return a table of stages ordered by the total time spent in them
+        """
+        summary = self.summary()
+        stages = sorted(summary["stages"], key=lambda stage: stage["total_seconds"], reverse=True)
+
+        # Other stages run inside the end-to-end "lookup" span, so shares are of that
+        lookup_total = sum(stage["total_seconds"] for stage in stages if stage["stage"] == "lookup")
+        grand_total = lookup_total or sum(stage["total_seconds"] for stage in stages) or 1.0
+
+        lines = [f"{'Stage':<24}{'Count':>8}{'Total s':>10}{'Mean ms':>10}{'Max ms':>10}{'Share':>8}", "-" * 70]
+        for stage in stages:
+            name = stage["stage"]
+            if stage["labels"]:
+                name += " (" + ", ".join(stage["labels"].values()) + ")"
+            lines.append(f"{name:<24}{stage['count']:>8}{stage['total_seconds']:>10.2f}"
+                         f"{stage['mean_seconds'] * 1000:>10.1f}{stage['max_seconds'] * 1000:>10.1f}"
+                         f"{stage['total_seconds'] / grand_total:>8.1%}")
+
+        if summary["counters"] or summary["gauges"]:
+            lines.append("")
+            for counter in summary["counters"] + summary["gauges"]:
+                labels = ", ".join(f"{name}={value}" for name, value in counter["labels"].items())
+                lines.append(f"{counter['name']}{' (' + labels + ')' if labels else ''}: {counter['value']}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        """
+        Save the metrics to a file: Prometheus text for .prom or .txt, JSON otherwise
+        """
+        with open(path, "w") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.summary(), f, indent=2)
+
+# Shared by every lookup in the process
+metrics = Metrics()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = self.server.metrics.prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/metrics.json":
+            body = json.dumps(self.server.metrics.summary()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve_metrics(port, host="127.0.0.1", source=metrics):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json on a background thread
+
+    Returns the server; call shutdown() on it to stop.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = source
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,200 @@
+"""
+Rate limiting, adaptive concurrency, retries and circuit breaking for batch lookups
+"""
+import asyncio
+import random
+import time
+
+class TokenBucket:
+    """
+    Asyncio token bucket that caps how often lookups may start
+
+    Tokens refill continuously at `rate` per second up to `burst`. Each
+    acquire() takes one token, waiting for the next one if the bucket is
+    empty. Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be greater than zero")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class AdaptiveConcurrency:
+    """
+    Additive-increase/multiplicative-decrease limit on lookups in flight
+
+    Completed lookups are judged in windows of `limit` lookups, or
+    `min_window` if that is larger, so a single unlucky lookup at a low limit
+    does not count as a spike. If a window's
+    failure rate stays under `error_threshold` and its mean latency stays
+    within `latency_tolerance` times the best latency seen so far, the limit
+    goes up by one; otherwise it is multiplied by `decrease`. The best latency
+    creeps towards slower windows, so a site that gets slower for good is not
+    mistaken for an overloaded one forever.
+
+    Args:
+        initial: Starting limit
+        minimum: Lowest the limit may fall to
+        maximum: Highest the limit may rise to
+        min_window: Fewest lookups a window is judged on
+        error_threshold: Failure rate in a window above which the limit is cut
+        latency_tolerance: Multiple of the best window latency above which the limit is cut
+        decrease: Factor the limit is multiplied by when it is cut
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None, min_window=20, error_threshold=0.2, latency_tolerance=2.0,
+                 decrease=0.5):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum or initial)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.min_window = min_window
+        self.error_threshold = error_threshold
+        self.latency_tolerance = latency_tolerance
+        self.decrease = decrease
+        self._baseline = None
+        self._latencies = []
+        self._failures = 0
+
+    def record(self, seconds, failed=False):
+        """
+        Record one completed lookup and adjust the limit at the end of a window
+
+        Returns the new limit if it changed, otherwise None.
+        """
+        if failed:
+            self._failures += 1
+        else:
+            self._latencies.append(seconds)
+
+        completed = len(self._latencies) + self._failures
+        if completed < max(self.limit, self.min_window):
+            return None
+
+        error_rate = self._failures / completed
+        mean = sum(self._latencies) / len(self._latencies) if self._latencies else None
+        self._latencies = []
+        self._failures = 0
+
+        if mean is not None:
+            if self._baseline is None or mean < self._baseline:
+                self._baseline = mean
+            else:
+                self._baseline += (mean - self._baseline) * 0.05
+
+        previous = self.limit
+        if error_rate > self.error_threshold or (mean is not None and mean > self._baseline * self.latency_tolerance):
+            self.limit = max(self.minimum, int(self.limit * self.decrease))
+        else:
+            self.limit = min(self.maximum, self.limit + 1)
+        return self.limit if self.limit != previous else None
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter between retries of a failed lookup
+
+    Args:
+        retries: Times a lookup may be retried after its first attempt
+        base_delay: Upper bound, in seconds, of the wait before the first retry
+        max_delay: Largest upper bound the wait may grow to
+    """
+
+    def __init__(self, retries=2, base_delay=1.0, max_delay=30.0):
+        self.retries = max(0, retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """
+        Seconds to wait before retry number `attempt` (starting at 1)
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    """
+    Pauses lookups after a run of consecutive failures
+
+    After `failure_threshold` failures in a row the circuit opens and wait()
+    holds every caller for `reset_timeout` seconds. The first caller through
+    after that is a probe: if it succeeds the circuit closes, and if it fails
+    the circuit opens again. Lookups that started before the circuit opened
+    may still finish while it is open or probing; their outcomes are ignored,
+    so only the probe decides when the circuit closes.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds to stay open before letting a probe through
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.trips = 0
+        self._failures = 0
+        self._opened_at = 0.0
+
+    async def wait(self):
+        """
+        Return once a lookup may start
+
+        Returns the time.monotonic() start time to pass back to record().
+        """
+        while True:
+            if self.state == "closed":
+                return time.monotonic()
+            if self.state == "open":
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining <= 0:
+                    self.state = "half-open"
+                    return time.monotonic()
+                await asyncio.sleep(remaining)
+            else:
+                # A probe is in flight; wait for its outcome
+                await asyncio.sleep(min(1.0, self.reset_timeout))
+
+    def record(self, failed, started_at=None):
+        """
+        Record the outcome of a lookup
+
+        Args:
+            failed: True if the lookup failed
+            started_at: The start time wait() returned for the lookup; outcomes
+                of lookups started before the circuit last opened are ignored
+
+        Returns "opened" or "closed" if the circuit changed state, otherwise None.
+        """
+        if started_at is not None and started_at < self._opened_at:
+            return None
+
+        if not failed:
+            self._failures = 0
+            if self.state != "closed":
+                self.state = "closed"
+                return "closed"
+            return None
+
+        self._failures += 1
+        if self.state == "half-open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self.trips += 1
+            return "opened"
+        return None
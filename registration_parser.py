@@ -0,0 +1,172 @@
+"""
+Offline parser for Queensland Transport registration check pages
+
+Takes the HTML of a page and, in a single pass, collects its forms (with
+hidden fields such as javax.faces.ViewState), the dt/dd pairs of every
+dl.data list, any ui-messages-error-detail messages and the visible text.
+Both lookup engines use it, so a result page is fetched once and never
+queried field by field.
+
+Run it directly to time parsing of saved pages:
+
+    python registration_parser.py saved_result.html --repeat 1000
+
+With no pages given it times the saved pages in tests/fixtures.
+"""
+import argparse
+import glob
+import os
+import time
+from html.parser import HTMLParser
+
+class RegistrationPageParser(HTMLParser):
+    """
+    Collect forms, dl.data pairs, error messages and visible text from a page
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms = {}
+        self.details = []
+        self.errors = []
+        self.text = []
+        self._form = None
+        self._in_data_list = False
+        self._capture = None
+        # Tag that opened the capture and how many of it are open, so nested markup doesn't end it early
+        self._capture_tag = None
+        self._depth = 0
+        self._buffer = []
+        self._term = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if tag == self._capture_tag:
+            self._depth += 1
+
+        if tag == "form":
+            form_id = attrs.get("id") or attrs.get("name")
+            self._form = {
+                "action": attrs.get("action") or "",
+                "method": (attrs.get("method") or "get").lower(),
+                "fields": {},
+                "buttons": {},
+            }
+            if form_id:
+                self.forms[form_id] = self._form
+        elif tag == "input" and self._form is not None and attrs.get("name"):
+            input_type = (attrs.get("type") or "text").lower()
+            if input_type in ("submit", "button", "image"):
+                self._form["buttons"][attrs["name"]] = attrs.get("value") or ""
+            elif input_type not in ("checkbox", "radio") or "checked" in attrs:
+                self._form["fields"][attrs["name"]] = attrs.get("value") or ""
+        elif tag == "button" and self._form is not None and attrs.get("name"):
+            self._form["buttons"][attrs["name"]] = attrs.get("value") or ""
+        elif tag == "dl" and "data" in classes:
+            self._in_data_list = True
+        elif tag in ("dt", "dd") and self._in_data_list:
+            self._start_capture(tag, tag)
+        elif "ui-messages-error-detail" in classes:
+            self._start_capture("error", tag)
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+        elif tag == "dl":
+            self._in_data_list = False
+        elif tag == self._capture_tag:
+            self._depth -= 1
+            if not self._depth:
+                self._finish_capture()
+
+    def handle_data(self, data):
+        self.text.append(data)
+        if self._capture is not None:
+            self._buffer.append(data)
+
+    def _start_capture(self, kind, tag):
+        if self._capture is not None:
+            self._finish_capture()
+        self._capture = kind
+        self._capture_tag = tag
+        self._depth = 1
+        self._buffer = []
+
+    def _finish_capture(self):
+        value = " ".join("".join(self._buffer).split())
+        if self._capture == "dt":
+            self._term = value
+        elif self._capture == "dd" and self._term is not None:
+            self.details.append((self._term, value))
+            self._term = None
+        elif self._capture == "error":
+            self.errors.append(value)
+        self._capture = None
+        self._capture_tag = None
+        self._depth = 0
+        self._buffer = []
+
+def parse_page(page_html):
+    """
+    Parse a page into its forms and any registration result content
+    """
+    parser = RegistrationPageParser()
+    parser.feed(page_html)
+    parser.close()
+    return parser
+
+def extract_results(page, plate_number):
+    """
+    Build the registration details dictionary from a parsed result page
+
+    Returns None when the page holds neither results nor a recognised message.
+    """
+    if page.errors:
+        return {"Plate Number": plate_number, "Status": "ERROR", "Message": page.errors[0]}
+
+    if "Registration not found" in "".join(page.text):
+        return {"Plate Number": plate_number, "Status": "NOT FOUND", "Message": "Registration not found"}
+
+    if not page.details:
+        return None
+
+    registration_details = {"Plate Number": plate_number}
+    for term, definition in page.details:
+        if term and term not in registration_details:  # Avoid duplicates
+            registration_details[term] = definition
+
+    if "Status" not in registration_details:
+        registration_details["Status"] = "REGISTERED" if "Expiry" in registration_details else "UNKNOWN"
+    return registration_details
+
+def parse_registration(page_html, plate_number):
+    """
+    Parse a result page straight to its registration details dictionary
+
+    Returns None when the page holds neither results nor a recognised message.
+    """
+    return extract_results(parse_page(page_html), plate_number)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "fixtures")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time parsing of saved registration check pages")
+    parser.add_argument("pages", nargs="*", help="Saved HTML pages (default: the pages in tests/fixtures)")
+    parser.add_argument("--repeat", "-n", type=int, default=1000, help="Times to parse each page (default: 1000)")
+    args = parser.parse_args()
+
+    pages = {}
+    for path in args.pages or sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages[os.path.relpath(path)] = f.read()
+
+    for name, page_html in pages.items():
+        registration_details = parse_registration(page_html, "PLATE")
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            parse_registration(page_html, "PLATE")
+        elapsed = time.perf_counter() - start
+
+        status = registration_details.get("Status") if registration_details else "UNRECOGNISED"
+        print(f"{name}: {status}, {len(page_html)} bytes, {elapsed / args.repeat * 1e6:.1f} us per parse")
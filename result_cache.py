@@ -0,0 +1,150 @@
+"""
+Persistent cache of registration results
+
+Results are stored in SQLite under a normalised plate key, with an in-memory
+LRU in front so repeat lookups within a run never touch the disk. Each result
+expires after a TTL chosen by its status, and the oldest entries are evicted
+once the cache grows past its size limit.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = "registration_cache.db"
+
+# Seconds a result stays fresh, by status. UNKNOWN, a page that couldn't be read,
+# uses the ERROR TTL; other statuses use the REGISTERED TTL.
+DEFAULT_TTLS = {
+    "REGISTERED": 24 * 60 * 60,
+    "NOT FOUND": 6 * 60 * 60,
+    "ERROR": 5 * 60,
+}
+
+DEFAULT_MAX_ENTRIES = 500000
+DEFAULT_MEMORY_ENTRIES = 10000
+
+# Check the on-disk size limit once every this many writes
+EVICT_EVERY = 1000
+
+def normalise_plate(plate_number):
+    """
+    Upper-case a plate number and strip all whitespace from it
+    """
+    return "".join(plate_number.split()).upper()
+
+class ResultCache:
+    """
+    SQLite-backed result cache with an in-memory LRU layer
+
+    Args:
+        path: SQLite file to store results in
+        ttls: Seconds each status stays fresh; merged over DEFAULT_TTLS
+        max_entries: Results kept on disk before the oldest are evicted
+        memory_entries: Results kept in the in-memory LRU
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttls=None, max_entries=DEFAULT_MAX_ENTRIES,
+                 memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "plate TEXT PRIMARY KEY, status TEXT NOT NULL, checked_at REAL NOT NULL, result TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_checked_at ON results (checked_at)")
+        self._db.commit()
+        self._evict()
+
+    def ttl_for(self, status):
+        if status == "UNKNOWN":
+            return self.ttls["ERROR"]
+        return self.ttls.get(status, self.ttls["REGISTERED"])
+
+    def _is_fresh(self, status, checked_at, max_age):
+        age = time.time() - checked_at
+        if max_age is not None and age > max_age:
+            return False
+        return age <= self.ttl_for(status)
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, plate_number, max_age=None):
+        """
+        Return the cached result for a plate, or None if there is no fresh one
+
+        Args:
+            plate_number: Plate number in any case or spacing
+            max_age: Optional limit in seconds on the result's age, on top of its TTL
+        """
+        key = normalise_plate(plate_number)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._db.execute(
+                    "SELECT status, checked_at, result FROM results WHERE plate = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1], json.loads(row[2]))
+                    self._remember(key, entry)
+
+            if entry is None or not self._is_fresh(entry[0], entry[1], max_age):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return dict(entry[2])
+
+    def put(self, plate_number, result):
+        """
+        Store a result dictionary for a plate
+        """
+        key = normalise_plate(plate_number)
+        status = result.get("Status", "UNKNOWN")
+        if self.ttl_for(status) <= 0:
+            return
+
+        checked_at = time.time()
+        with self._lock:
+            self._remember(key, (status, checked_at, dict(result)))
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (plate, status, checked_at, result) VALUES (?, ?, ?, ?)",
+                (key, status, checked_at, json.dumps(result)),
+            )
+            self._db.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM results WHERE plate IN (SELECT plate FROM results ORDER BY checked_at LIMIT ?)",
+                (excess,),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,74 @@
+"""
+Incremental writers for registration results
+
+Each result is written and flushed as soon as it arrives, so other jobs can
+tail the output file while a batch is still running.
+"""
+import csv
+import json
+
+FORMATS = ("jsonl", "csv")
+
+# Columns written to CSV output; fields outside this list are left out
+CSV_FIELDS = [
+    "Plate Number",
+    "Status",
+    "Message",
+    "Registration number",
+    "Vehicle Identification Number (VIN)",
+    "Description",
+    "Purpose of use",
+    "Expiry",
+]
+
+class JsonlWriter:
+    """
+    Writes one JSON object per line
+    """
+
+    def __init__(self, f):
+        self._file = f
+
+    def write(self, result):
+        self._file.write(json.dumps(result) + "\n")
+
+    def close(self):
+        self._file.close()
+
+class CsvWriter:
+    """
+    Writes results as CSV rows with the columns in CSV_FIELDS
+    """
+
+    def __init__(self, f):
+        self._file = f
+        self._writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore", lineterminator="\n")
+        self._writer.writeheader()
+
+    def write(self, result):
+        self._writer.writerow(result)
+
+    def close(self):
+        self._file.close()
+
+def format_for(path, output_format=None):
+    """
+    Pick the output format from an explicit choice or the file extension
+    """
+    if output_format:
+        return output_format
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def open_result_writer(path, output_format=None):
+    """
+    Open a line-buffered result writer for a file
+
+    Args:
+        path: File to write results to
+        output_format: "jsonl" or "csv"; guessed from the extension if omitted
+    """
+    output_format = format_for(path, output_format)
+    f = open(path, "w", buffering=1, newline="", encoding="utf-8")
+    if output_format == "csv":
+        return CsvWriter(f)
+    return JsonlWriter(f)
@@ -0,0 +1,311 @@
+"""
+Local stand-in for the Queensland Transport registration check
+
+Serves a VehicleSearch.xhtml that behaves like the real one closely enough to
+exercise both lookup engines without touching the government site: a Terms of
+Use form, the vehicleSearchForm, dl.data results, ui-messages-error-detail
+errors and a "Registration not found" page. Each JSF session has its own
+javax.faces.ViewState, and posts with a stale one are rejected.
+
+Response latency and failure rates can be set to see how the searcher
+behaves against a slow or unreliable site. Run it with:
+
+    python stand_in_server.py --port 8080 --latency 0.2 --error-rate 0.05
+
+and point the searcher at it with
+--url http://127.0.0.1:8080/checkrego/application/VehicleSearch.xhtml
+"""
+import argparse
+import html
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEARCH_PATH = "/checkrego/application/VehicleSearch.xhtml"
+
+# Plates with fixed answers; any other valid plate gets a deterministic synthetic one
+FIXTURES = {
+    "ABC123": {
+        "Registration number": "ABC123",
+        "Vehicle Identification Number (VIN)": "JTDBR32E720123456",
+        "Description": "2015 TOYOTA COROLLA SEDAN",
+        "Purpose of use": "Private",
+        "Status": "REGISTERED",
+        "Expiry": "14/03/2027",
+    },
+    "XYZ123": {
+        "Registration number": "XYZ123",
+        "Vehicle Identification Number (VIN)": "6T1BF3FK50X098765",
+        "Description": "2019 MAZDA CX-5 WAGON",
+        "Purpose of use": "Private",
+        "Status": "REGISTERED",
+        "Expiry": "02/11/2026",
+    },
+    "NOTREG": None,
+}
+
+VALID_PLATE = re.compile(r"^[A-Z0-9]{1,9}$")
+
+UNAVAILABLE_MESSAGE = "The service is currently unavailable. Please try again later."
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Check registration</title></head>
+<body>
+<h1>Check registration</h1>
+{content}
+</body>
+</html>
+"""
+
+TERMS = """<form id="termsForm" name="termsForm" method="post" action="{action}">
+<input type="hidden" name="termsForm" value="termsForm" />
+<p>You must accept the Terms of Use before checking a registration.</p>
+<button id="termsForm:acceptButton" name="termsForm:acceptButton" class="ui-button" type="submit">Accept</button>
+<input type="hidden" name="javax.faces.ViewState" id="j_id1:javax.faces.ViewState:0" value="{view_state}" />
+</form>
+"""
+
+SEARCH = """{messages}<form id="vehicleSearchForm" name="vehicleSearchForm" method="post" action="{action}">
+<input type="hidden" name="vehicleSearchForm" value="vehicleSearchForm" />
+<label for="vehicleSearchForm:plateNumber">Registration number</label>
+<input id="vehicleSearchForm:plateNumber" name="vehicleSearchForm:plateNumber" type="text" value="" />
+<button id="vehicleSearchForm:confirmButton" name="vehicleSearchForm:confirmButton" class="ui-button" type="submit">Search</button>
+<input type="hidden" name="javax.faces.ViewState" id="j_id1:javax.faces.ViewState:0" value="{view_state}" />
+</form>
+"""
+
+ERROR = """<div class="ui-messages-error ui-corner-all">
+<span class="ui-messages-error-summary">Error</span>
+<span class="ui-messages-error-detail">{message}</span>
+</div>
+"""
+
+NOT_FOUND = """<div class="result"><p>Registration not found</p></div>
+"""
+
+RESULT = """<div class="result">
+<dl class="data">
+{rows}</dl>
+</div>
+"""
+
+def registration_for(plate):
+    """
+    Return the registration details the stand-in reports for a plate, or None if it is not found
+    """
+    if plate in FIXTURES:
+        return FIXTURES[plate]
+
+    checksum = zlib.crc32(plate.encode())
+    if checksum % 10 >= 7:
+        return None
+
+    makes = ["TOYOTA HILUX UTILITY", "FORD RANGER UTILITY", "HYUNDAI I30 HATCHBACK",
+             "MAZDA 3 SEDAN", "KIA SPORTAGE WAGON", "TESLA MODEL 3 SEDAN"]
+    day = checksum % 28 + 1
+    month = checksum // 28 % 12 + 1
+    year = 2025 + checksum // 336 % 3
+    return {
+        "Registration number": plate,
+        "Vehicle Identification Number (VIN)": f"SYN{checksum:014d}"[:17],
+        "Description": f"{2005 + checksum % 20} {makes[checksum % len(makes)]}",
+        "Purpose of use": "Private",
+        "Status": "REGISTERED",
+        "Expiry": f"{day:02d}/{month:02d}/{year}",
+    }
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StandIn/1.0"
+
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm and delayed ACKs add ~40 ms to every kept-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _simulate_conditions(self):
+        """
+        Delay the response and decide whether to fail it outright
+
+        Returns True if a 503 has already been sent.
+        """
+        server = self.server
+        delay = server.latency + random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if random.random() < server.failure_rate:
+            self.send_error(503, "Service Unavailable")
+            return True
+        return False
+
+    def _session(self):
+        cookies = {}
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = part.strip().partition("=")
+            cookies[name] = value
+
+        session_id = cookies.get("JSESSIONID")
+        with self.server.lock:
+            session = self.server.sessions.get(session_id)
+            if session is None:
+                session_id = secrets.token_hex(16)
+                session = {"accepted": False, "view_state": None}
+                self.server.sessions[session_id] = session
+        return session_id, session
+
+    def _send_page(self, session_id, content, status=200):
+        body = PAGE.format(content=content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", f"JSESSIONID={session_id}; Path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _render(self, session_id, session, messages=""):
+        session["view_state"] = secrets.token_urlsafe(24)
+        if session["accepted"]:
+            content = SEARCH.format(messages=messages, action=SEARCH_PATH, view_state=session["view_state"])
+        else:
+            content = TERMS.format(action=SEARCH_PATH, view_state=session["view_state"])
+        self._send_page(session_id, content)
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path != SEARCH_PATH:
+            self.send_error(404)
+            return
+        if self._simulate_conditions():
+            return
+        session_id, session = self._session()
+        self._render(session_id, session)
+
+    def do_POST(self):
+        if urllib.parse.urlsplit(self.path).path != SEARCH_PATH:
+            self.send_error(404)
+            return
+
+        # Read the body first so a simulated failure leaves the connection usable
+        length = int(self.headers.get("Content-Length") or 0)
+        fields = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode("utf-8"), keep_blank_values=True))
+
+        if self._simulate_conditions():
+            return
+        session_id, session = self._session()
+
+        if fields.get("javax.faces.ViewState") != session["view_state"]:
+            # JSF answers a stale view with its error page; send the client back to the start
+            self._render(session_id, session, ERROR.format(message="Your session has expired. Please try again."))
+            return
+
+        if "termsForm:acceptButton" in fields:
+            session["accepted"] = True
+            self.send_response(302)
+            self.send_header("Location", SEARCH_PATH)
+            self.send_header("Content-Length", "0")
+            self.send_header("Set-Cookie", f"JSESSIONID={session_id}; Path=/; HttpOnly")
+            self.end_headers()
+            return
+
+        if not session["accepted"] or "vehicleSearchForm:confirmButton" not in fields:
+            self._render(session_id, session)
+            return
+
+        if random.random() < self.server.error_rate:
+            self._render(session_id, session, ERROR.format(message=UNAVAILABLE_MESSAGE))
+            return
+
+        plate = fields.get("vehicleSearchForm:plateNumber", "").strip().upper()
+        if not VALID_PLATE.match(plate):
+            self._render(session_id, session, ERROR.format(message="Please enter a valid registration number."))
+            return
+
+        details = registration_for(plate)
+        if details is None:
+            self._send_page(session_id, NOT_FOUND)
+            return
+
+        rows = "".join(f"<dt>{html.escape(term)}</dt>\n<dd>{html.escape(value)}</dd>\n"
+                       for term, value in details.items())
+        self._send_page(session_id, RESULT.format(rows=rows))
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Threaded stand-in server
+
+    Args:
+        address: (host, port) to listen on; port 0 picks a free one
+        verbose: Log each request
+        latency: Seconds to wait before answering each request
+        jitter: Random +/- seconds added to the latency
+        error_rate: Fraction of searches answered with a ui-messages-error-detail error
+        failure_rate: Fraction of requests answered with HTTP 503
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, verbose=False, latency=0.0, jitter=0.0, error_rate=0.0, failure_rate=0.0):
+        super().__init__(address, StandInHandler)
+        self.verbose = verbose
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-request are expected when a run is interrupted
+        if self.verbose:
+            super().handle_error(request, client_address)
+
+    @property
+    def search_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{SEARCH_PATH}"
+
+def start_server(host="127.0.0.1", port=0, verbose=False, **conditions):
+    """
+    Start a stand-in server on a background thread
+
+    Returns the server; call shutdown() on it when finished. Its search_url
+    attribute is the address to pass to the lookup engines. Keyword
+    arguments such as latency and error_rate are passed to StandInServer.
+    """
+    server = StandInServer((host, port), verbose=verbose, **conditions)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Queensland registration check")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", "-p", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Don't log each request")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds added to the latency (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of searches that return a site error message (default: 0)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of requests that return HTTP 503 (default: 0)")
+    args = parser.parse_args()
+
+    server = StandInServer((args.host, args.port), verbose=not args.quiet, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, failure_rate=args.failure_rate)
+    print(f"Stand-in registration check running at {server.search_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping stand-in server")
+    finally:
+        server.server_close()
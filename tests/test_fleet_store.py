@@ -0,0 +1,41 @@
+"""
+Tests for which tracked plates FleetStore.due picks for a refresh
+"""
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from fleet_store import FleetStore
+
+class DueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fleet = FleetStore(os.path.join(self.directory.name, "fleet.db"))
+        self.fleet.add(["EXPIRED", "SOON", "LATER"])
+        for plate, days in [("EXPIRED", -400), ("SOON", 5), ("LATER", 200)]:
+            expiry = (date.today() + timedelta(days=days)).strftime("%d/%m/%Y")
+            self.fleet.record(plate, {"Status": "REGISTERED", "Expiry": expiry})
+
+    def tearDown(self):
+        self.fleet.close()
+        self.directory.cleanup()
+
+    def test_new_plates(self):
+        self.fleet.add(["NEW1"])
+        self.assertIn(("NEW1", "new"), self.fleet.due(today=date.today()))
+
+    def test_expired_and_expiring_plates_are_due_the_next_day(self):
+        due = dict(self.fleet.due(expiry_window=14, today=date.today() + timedelta(days=1)))
+        self.assertEqual(due, {"EXPIRED": "expiring", "SOON": "expiring"})
+
+    def test_expiring_plates_are_checked_once_a_day(self):
+        self.assertEqual(self.fleet.due(today=date.today()), [])
+
+    def test_failed_plates(self):
+        self.fleet.record("LATER", {"Status": "ERROR", "Message": "Timed out"})
+        self.assertIn(("LATER", "failed"), self.fleet.due(today=date.today()))
+
+if __name__ == "__main__":
+    unittest.main()
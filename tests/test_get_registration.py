@@ -0,0 +1,104 @@
+"""
+Tests for Get-Registration.py's failure handling, stdin reader and work queue coordinator
+"""
+import asyncio
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+import work_queue
+
+SEARCHER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Get-Registration.py")
+
+def load_searcher():
+    spec = importlib.util.spec_from_file_location("get_registration", SEARCHER_PATH)
+    searcher = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(searcher)
+    return searcher
+
+class IsTransientFailureTests(unittest.TestCase):
+
+    def setUp(self):
+        self.searcher = load_searcher()
+
+    def test_final_results(self):
+        self.assertFalse(self.searcher.is_transient_failure({"Status": "REGISTERED"}))
+        self.assertFalse(self.searcher.is_transient_failure({"Status": "NOT FOUND"}))
+
+    def test_site_errors(self):
+        self.assertTrue(self.searcher.is_transient_failure(
+            {"Status": "ERROR", "Message": "The service is currently unavailable. Please try again later."}))
+        self.assertFalse(self.searcher.is_transient_failure(
+            {"Status": "ERROR", "Message": "Please enter a valid registration number."}))
+
+    def test_unreadable_page(self):
+        self.assertTrue(self.searcher.is_transient_failure(
+            {"Status": "UNKNOWN", "Message": "Could not extract registration details"}))
+
+class ReadStdinPlatesTests(unittest.TestCase):
+
+    def test_stdin_is_read_without_blocking_the_event_loop(self):
+        searcher = load_searcher()
+        read_fd, write_fd = os.pipe()
+        events = []
+
+        def write_rest():
+            os.write(write_fd, b"\nxyz 789\n")
+            os.close(write_fd)
+
+        async def collect():
+            plates = []
+            async for plate in searcher.read_stdin_plates(["ABC123"]):
+                plates.append(plate)
+                if len(plates) == 2:
+                    # stdin is idle until a line is written from another thread; the loop must keep running
+                    await asyncio.sleep(0.05)
+                    events.append("loop ran")
+                    threading.Timer(0.05, write_rest).start()
+            return plates
+
+        os.write(write_fd, b"def 456\n")
+        with open(read_fd, "r") as stdin, unittest.mock.patch.object(sys, "stdin", stdin):
+            plates = asyncio.run(collect())
+
+        self.assertEqual(plates, ["ABC123", "DEF456", "XYZ789"])
+        self.assertEqual(events, ["loop ran"])
+
+class CoordinateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.directory.name, "queue.db")
+        self.searcher = load_searcher()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_result_finished_after_the_last_read_is_collected(self):
+        worker = work_queue.WorkQueue(self.queue_path)
+        unfinished = work_queue.WorkQueue.unfinished
+        calls = []
+
+        # A worker finishes the only plate between the coordinator's read of results and its check for unfinished plates
+        def finish_during_check(queue):
+            calls.append(queue)
+            if len(calls) == 2:
+                (job_id, plate), = worker.claim("worker")
+                worker.complete(job_id, plate, {"Plate Number": plate, "Status": "REGISTERED"}, "worker")
+            return unfinished(queue)
+
+        with unittest.mock.patch.object(work_queue.WorkQueue, "unfinished", finish_during_check), \
+                contextlib.redirect_stdout(io.StringIO()):
+            counts = self.searcher.coordinate(self.queue_path, ["ABC123"], poll_interval=0)
+        worker.close()
+
+        self.assertEqual(counts, {"REGISTERED": 1})
+
+if __name__ == "__main__":
+    unittest.main()
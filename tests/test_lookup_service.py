@@ -0,0 +1,56 @@
+"""
+Tests for LookupService when its background batch fails
+"""
+import contextlib
+import io
+import threading
+import unittest
+
+from lookup_service import LookupService, ServiceServer, service_running
+
+async def failing_check_many(plate_numbers, **options):
+    async for plate in plate_numbers:
+        if plate == "BROKEN":
+            raise Exception("database is locked")
+        yield {"Plate Number": plate, "Status": "REGISTERED"}
+
+class LookupServiceTests(unittest.TestCase):
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.service = LookupService(failing_check_many)
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_lookups(self):
+        self.assertEqual(self.service.check(["abc 123"]), [{"Plate Number": "ABC123", "Status": "REGISTERED"}])
+        self.assertTrue(self.service.running)
+
+    def test_waiters_fail_when_the_batch_fails(self):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaisesRegex(Exception, "stopped"):
+                self.service.check(["BROKEN"], timeout=5)
+        self.assertFalse(self.service.running)
+
+        # Later calls fail straight away instead of waiting for a timeout
+        with self.assertRaisesRegex(Exception, "stopped"):
+            self.service.check(["ABC123"], timeout=5)
+
+    def test_health_reports_a_stopped_service(self):
+        server = ServiceServer(self.service, port=0)
+        port = server.server_address[1]
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            self.assertTrue(service_running(port))
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                with self.assertRaises(Exception):
+                    self.service.check(["BROKEN"], timeout=5)
+            self.assertFalse(service_running(port))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    unittest.main()
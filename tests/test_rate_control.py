@@ -0,0 +1,59 @@
+"""
+Tests for the circuit breaker's handling of lookups that overlap a trip
+"""
+import asyncio
+import unittest
+
+from rate_control import CircuitBreaker
+
+class CircuitBreakerTests(unittest.TestCase):
+
+    def trip(self, breaker):
+        started = [asyncio.run(breaker.wait()) for _ in range(breaker.failure_threshold)]
+        changes = [breaker.record(True, started_at) for started_at in started]
+        self.assertEqual(changes[-1], "opened")
+        return started
+
+    def test_late_outcomes_do_not_close_an_open_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+        in_flight = asyncio.run(breaker.wait())
+        self.trip(breaker)
+
+        self.assertIsNone(breaker.record(False, in_flight))
+        self.assertEqual(breaker.state, "open")
+
+    def test_only_the_probe_closes_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+        in_flight = [asyncio.run(breaker.wait()) for _ in range(2)]
+        self.trip(breaker)
+
+        probe = asyncio.run(breaker.wait())
+        self.assertEqual(breaker.state, "half-open")
+        self.assertIsNone(breaker.record(True, in_flight[0]))
+        self.assertIsNone(breaker.record(False, in_flight[1]))
+        self.assertEqual(breaker.state, "half-open")
+
+        self.assertEqual(breaker.record(False, probe), "closed")
+        self.assertEqual(breaker.trips, 1)
+
+    def test_failed_probe_opens_the_circuit_again(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+        self.trip(breaker)
+        probe = asyncio.run(breaker.wait())
+        self.assertEqual(breaker.record(True, probe), "opened")
+        self.assertEqual(breaker.trips, 2)
+
+    def test_failures_from_before_a_trip_do_not_count_after_it_closes(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        in_flight = [asyncio.run(breaker.wait()) for _ in range(2)]
+        self.trip(breaker)
+        probe = asyncio.run(breaker.wait())
+        self.assertEqual(breaker.record(False, probe), "closed")
+
+        for started_at in in_flight:
+            self.assertIsNone(breaker.record(True, started_at))
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.trips, 1)
+
+if __name__ == "__main__":
+    unittest.main()
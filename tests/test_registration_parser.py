@@ -0,0 +1,77 @@
+"""
+Tests for registration_parser against saved pages in tests/fixtures
+"""
+import os
+import unittest
+
+from registration_parser import parse_page, parse_registration
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+class ParseRegistrationTests(unittest.TestCase):
+
+    def test_results(self):
+        result = parse_registration(read_fixture("results.html"), "ABC123")
+        self.assertEqual(result, {
+            "Plate Number": "ABC123",
+            "Registration number": "ABC123",
+            "Vehicle Identification Number (VIN)": "JTDBR32E720123456",
+            "Description": "2015 TOYOTA COROLLA SEDAN",
+            "Purpose of use": "Private",
+            "Status": "REGISTERED",
+            "Expiry": "14/03/2027",
+        })
+
+    def test_error(self):
+        result = parse_registration(read_fixture("error.html"), "ABC!23")
+        self.assertEqual(result, {"Plate Number": "ABC!23", "Status": "ERROR",
+                                  "Message": "Please enter a valid registration number."})
+
+    def test_not_found(self):
+        result = parse_registration(read_fixture("not_found.html"), "NOTREG")
+        self.assertEqual(result, {"Plate Number": "NOTREG", "Status": "NOT FOUND",
+                                  "Message": "Registration not found"})
+
+    def test_duplicate_terms_keep_the_first(self):
+        result = parse_registration(read_fixture("duplicate_dt.html"), "XYZ123")
+        self.assertEqual(result["Status"], "REGISTERED")
+        self.assertEqual(result["Expiry"], "02/11/2026")
+
+    def test_missing_status_with_expiry_is_registered(self):
+        result = parse_registration(read_fixture("missing_status.html"), "ABC123")
+        self.assertEqual(result["Status"], "REGISTERED")
+        self.assertEqual(result["Description"], "2015 TOYOTA COROLLA SEDAN")
+
+    def test_missing_status_and_expiry_is_unknown(self):
+        page_html = read_fixture("missing_status.html").replace("<dt>Expiry</dt>", "<dt>Expires</dt>")
+        self.assertEqual(parse_registration(page_html, "ABC123")["Status"], "UNKNOWN")
+
+    def test_unrecognised_page(self):
+        self.assertIsNone(parse_registration("<html><body><p>Maintenance</p></body></html>", "ABC123"))
+
+class ErrorMarkupTests(unittest.TestCase):
+
+    def test_error_in_a_div(self):
+        page = parse_page(read_fixture("error_div.html"))
+        self.assertEqual(page.errors, ["Please enter a valid registration number."])
+
+    def test_error_in_a_list_item(self):
+        page = parse_page(read_fixture("error_list.html"))
+        self.assertEqual(page.errors, ["Please enter a valid registration number."])
+
+    def test_error_with_nested_span(self):
+        page = parse_page(read_fixture("error_nested.html"))
+        self.assertEqual(page.errors, ["Please enter a valid registration number."])
+
+    def test_error_page_keeps_the_search_form(self):
+        page = parse_page(read_fixture("error_div.html"))
+        fields = page.forms["vehicleSearchForm"]["fields"]
+        self.assertEqual(fields["javax.faces.ViewState"], "-1234567890123456789:987654321")
+        self.assertIn("vehicleSearchForm:confirmButton", page.forms["vehicleSearchForm"]["buttons"])
+
+if __name__ == "__main__":
+    unittest.main()
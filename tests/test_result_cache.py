@@ -0,0 +1,40 @@
+"""
+Tests for how long ResultCache keeps each kind of result
+"""
+import os
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+from result_cache import ResultCache
+
+class ResultCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.directory.name, "cache.db"),
+                                 ttls={"REGISTERED": 3600, "ERROR": 60})
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def age_by(self, seconds):
+        return unittest.mock.patch("result_cache.time.time", return_value=time.time() + seconds)
+
+    def test_registered_results_keep_their_ttl(self):
+        self.cache.put("ABC123", {"Plate Number": "ABC123", "Status": "REGISTERED"})
+        with self.age_by(120):
+            self.assertEqual(self.cache.get("abc 123")["Status"], "REGISTERED")
+
+    def test_unknown_results_expire_like_errors(self):
+        self.cache.put("ABC123", {"Plate Number": "ABC123", "Status": "UNKNOWN",
+                                  "Message": "Could not extract registration details"})
+        with self.age_by(30):
+            self.assertIsNotNone(self.cache.get("ABC123"))
+        with self.age_by(120):
+            self.assertIsNone(self.cache.get("ABC123"))
+
+if __name__ == "__main__":
+    unittest.main()
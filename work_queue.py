@@ -0,0 +1,150 @@
+"""
+Durable work queue for spreading lookups over many worker processes
+
+Plates are stored in a SQLite file. Workers claim them with a time-limited
+lease and report each result back; a plate whose worker dies is claimed again
+once its lease runs out, so no plate is lost. The coordinator reads results
+back from the same file in the order they finished.
+
+Workers on one machine can share the file directly. Workers on other machines
+need it on a shared filesystem with working file locks, so the queue uses
+SQLite's rollback journal rather than WAL.
+"""
+import json
+import sqlite3
+import time
+
+DEFAULT_LEASE_SECONDS = 300
+
+class WorkQueue:
+    """
+    SQLite-backed queue of plates with leases and a results table
+
+    Args:
+        path: SQLite file holding the queue
+        lease_seconds: How long a claim lasts before another worker may take the plate
+    """
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, plate TEXT NOT NULL UNIQUE, state TEXT NOT NULL DEFAULT 'pending', "
+            "owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "id INTEGER PRIMARY KEY, job_id INTEGER NOT NULL UNIQUE, plate TEXT NOT NULL, "
+            "result TEXT NOT NULL, worker TEXT, finished_at REAL NOT NULL)"
+        )
+
+    def enqueue(self, plate_numbers, batch_size=1000):
+        """
+        Add plates to the queue, ignoring any it already holds
+
+        Returns the number of plates added.
+        """
+        added = 0
+        batch = []
+
+        def flush():
+            nonlocal added
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._db.total_changes
+                self._db.executemany("INSERT OR IGNORE INTO jobs (plate) VALUES (?)", [(p,) for p in batch])
+                added += self._db.total_changes - before
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            batch.clear()
+
+        for plate in plate_numbers:
+            batch.append(plate)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return added
+
+    def claim(self, worker_id, limit=1):
+        """
+        Lease up to `limit` pending plates, or plates whose lease has expired
+
+        Returns a list of (job_id, plate) tuples.
+        """
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            jobs = self._db.execute(
+                "SELECT id, plate FROM jobs WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE jobs SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                [(worker_id, now + self.lease_seconds, job_id) for job_id, _ in jobs],
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return jobs
+
+    def renew(self, worker_id):
+        """
+        Extend the lease on every plate this worker holds
+        """
+        self._db.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE owner = ? AND state = 'leased'",
+            (time.time() + self.lease_seconds, worker_id),
+        )
+
+    def complete(self, job_id, plate_number, result, worker_id):
+        """
+        Store a plate's result and mark its job done
+
+        If the lease had expired and another worker also finished the plate,
+        the first result is kept so the coordinator sees each plate once.
+        """
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute(
+                "INSERT OR IGNORE INTO results (job_id, plate, result, worker, finished_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, plate_number, json.dumps(result), worker_id, time.time()),
+            )
+            self._db.execute("UPDATE jobs SET state = 'done', lease_expires = NULL WHERE id = ?", (job_id,))
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def unfinished(self):
+        """
+        Number of plates that are pending or leased
+        """
+        return self._db.execute("SELECT COUNT(*) FROM jobs WHERE state != 'done'").fetchone()[0]
+
+    def counts(self):
+        """
+        Number of jobs in each state
+        """
+        return dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def results_after(self, cursor=0, limit=1000):
+        """
+        Return up to `limit` results stored after `cursor`, and the new cursor
+        """
+        rows = self._db.execute(
+            "SELECT id, result FROM results WHERE id > ? ORDER BY id LIMIT ?", (cursor, limit)
+        ).fetchall()
+        if rows:
+            cursor = rows[-1][0]
+        return [json.loads(result) for _, result in rows], cursor
+
+    def close(self):
+        self._db.close()